@@ -1,11 +1,18 @@
 # app_flet.py
 import flet as ft
-import time, random, threading
-from chatwoot_config.chatwoot_client import dispatch_message
+import time, threading
+from chatwoot_config.webhooks import DeliveryTracker, start_webhook_server
+from core.batch import BASE_COLUMNS, DUPLICADO, parse_lote, render, select_rows, validate_rows
+from core.adaptive import AdaptiveRate
+from core.dryrun import SIMULADO, format_duration, preview_batch
+from core.entries import RunEntry
+from core.report_store import ReportStore
+from core.run_state import RunState
+from core.scheduler import Campaign, CampaignScheduler, SendWindow
 
 # importa componentes modulares
+# (chatwoot_client e pages.reports são carregados no primeiro uso, para a janela abrir mais rápido)
 from pages.nav import AppNavigation
-from pages.reports import build_reports
 
 def main(page: ft.Page):
     page.title = "dispatchr"
@@ -14,18 +21,11 @@ def main(page: ft.Page):
     page.window.width = 890
     page.window.height = 830
 
-    # estado compartilhado entre views e worker
-    state = {
-        "nav_index": 0,
-        "is_running": False,
-        "is_paused": False,
-        "progress": 0.0,
-        "total_sent": 0,
-        "successes": 0,
-        "failures": 0,
-        "recent_logs": [],
-        "reports": [],  # lista de relatórios
-    }
+    # estado de execução compartilhado entre views e threads de envio (contadores,
+    # pausa, logs recentes e relatórios); acesso thread-safe via RunState
+    state = RunState()
+    # estado só da interface
+    ui_state = {"nav_index": 0}
 
     def safe_update():
         try:
@@ -67,11 +67,19 @@ def main(page: ft.Page):
         border_radius=15,
     )
 
+    # Caixa de entrada usada nos envios; opções vêm do cache de descoberta (chatwoot_config/discovery.py)
+    inbox_dropdown = ft.Dropdown(label="Caixa de entrada", width=260, border_radius=15, dense=True, options=[])
+    inbox_refresh_btn = ft.IconButton(
+        icon=ft.Icons.REFRESH,
+        tooltip="Atualizar caixas de entrada",
+        on_click=lambda e: threading.Thread(target=_load_inboxes, args=(True,), daemon=True).start()
+    )
+
     header = ft.Container(
         content=ft.Row(
             controls=[
                 ft.Image(src="dispatchr_header.png", width=120, fit=ft.ImageFit.CONTAIN),
-                theme_button_container
+                ft.Row([inbox_dropdown, inbox_refresh_btn, theme_button_container], spacing=5)
             ],
             alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
             vertical_alignment=ft.CrossAxisAlignment.CENTER
@@ -114,49 +122,62 @@ def main(page: ft.Page):
     cnpj_field.on_change = update_message
 
     def _make_entry_from_fields(name, email, phone, cnpj, status_text):
-        return {
-            "to": name or "",
-            "email": email or "",
-            "phone": phone or "",
-            "cnpj": cnpj or "",
-            "status": status_text,
-            "time": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        return RunEntry(name, email, phone, cnpj, status_text)
 
     def _persist_reports():
         try:
-            page.client_storage.set("dispatchr_reports", state["reports"])
+            page.client_storage.set("dispatchr_reports", state.persistable_reports())
         except Exception:
             pass
 
+    # Status de entrega (webhook do Chatwoot): eventos chegam em rajadas, então
+    # persistência e redesenho são agrupados em uma janela curta
+    delivery_timer = {"value": None}
+
+    def _flush_delivery_updates():
+        delivery_timer["value"] = None
+        _persist_reports()
+        # só atualiza os números de entrega da aba Relatórios (mantém o detalhe aberto)
+        view = ui_state.get("reports_view")
+        if ui_state["nav_index"] == 1 and view is not None:
+            view.data()
+            safe_update()
+
+    def _on_delivery_update(entry, report):
+        if report is not None and entry.delivery == "falhou":
+            state.note_delivery_failure(entry, report)
+        if delivery_timer["value"] is None:
+            delivery_timer["value"] = threading.Timer(2.0, _flush_delivery_updates)
+            delivery_timer["value"].daemon = True
+            delivery_timer["value"].start()
+
+    delivery_tracker = DeliveryTracker(on_update=_on_delivery_update)
+
     def send_click(e):
         status.value = "Enviando…"
         safe_update()
         sent_ok = False
         entry = None
         try:
+            from chatwoot_config.chatwoot_client import dispatch_message
             msg_id = dispatch_message(
                 name=name_field.value,
                 email=email_field.value,
                 phone=phone_field.value,
                 cnpj=cnpj_field.value,
-                content=msg_field.value
+                content=msg_field.value,
+                inbox_id=inbox_dropdown.value or None
             )
             status.value = f"✅ Enviado! ID: {msg_id}"
             sent_ok = True
-            # atualiza métricas básicas
-            state["total_sent"] += 1
-            state["successes"] += 1
+            # atualiza métricas básicas (envio avulso: fora dos contadores de qualquer lote)
             entry = _make_entry_from_fields(name_field.value, email_field.value, phone_field.value, cnpj_field.value, "sucesso")
-            state["recent_logs"].insert(0, entry)
-            state["recent_logs"] = state["recent_logs"][:200]
+            entry.message_id = msg_id
+            state.record(entry, ok=True)
         except Exception as err:
             status.value = f"❌ Erro: {err}"
-            state["total_sent"] += 1
-            state["failures"] += 1
             entry = _make_entry_from_fields(name_field.value, email_field.value, phone_field.value, cnpj_field.value, "falha")
-            state["recent_logs"].insert(0, entry)
-            state["recent_logs"] = state["recent_logs"][:200]
+            state.record(entry, ok=False)
         finally:
             # gerar relatório individual de envio (cada disparo vira um relatório único)
             if entry is None:
@@ -167,11 +188,15 @@ def main(page: ft.Page):
                 "successes": 1 if sent_ok else 0,
                 "failures": 0 if sent_ok else 1,
                 "entries": [entry],
+                # mensagem literal (chaves escapadas) para permitir o reenvio
+                "template": (msg_field.value or "").replace("{", "{{").replace("}", "}}"),
+                "inbox_id": inbox_dropdown.value or None,
             }
-            state["reports"].insert(0, report)
-            # limitar número de relatórios mantidos
-            state["reports"] = state["reports"][:500]
+            # buffer limitado: o relatório mais antigo sai sozinho
+            state.add_report(report)
+            delivery_tracker.track(entry, report)
             _persist_reports()
+            _refresh_metrics()
             safe_update()
 
     send_btn = ft.ElevatedButton(text="Enviar", on_click=send_click, width=120)
@@ -199,10 +224,39 @@ def main(page: ft.Page):
         text_size=12
     )
 
+    anexo_field = ft.TextField(
+        label="Anexo (caminho do arquivo, opcional)",
+        width=360,
+        border_radius=15,
+        hint_text="Imagem ou PDF enviado junto com a mensagem para todos do lote",
+        text_size=12
+    )
+
+    # Tabela de referência local: colunas extras para o template, buscadas por CNPJ ou telefone
+    tabela_field = ft.TextField(
+        label="Tabela de enriquecimento (CSV/SQLite, opcional)",
+        width=250,
+        border_radius=15,
+        hint_text="Colunas da tabela ficam disponíveis no template, ex.: {segmento}",
+        text_size=12
+    )
+    tabela_chave = ft.Dropdown(
+        label="Chave",
+        width=100,
+        border_radius=15,
+        dense=True,
+        value="cnpj",
+        options=[ft.dropdown.Option("cnpj"), ft.dropdown.Option("telefone")]
+    )
+
+    def _load_lookup(path: str, kind: str):
+        """Abre (e indexa na primeira vez) a tabela de referência; None se não informada."""
+        if not (path or "").strip():
+            return None
+        from core.lookup import LookupTable
+        return LookupTable(path.strip(), kind or "cnpj")
+
     # Controles novos: pausa e configuração de intervalo
-    # mantemos as variáveis locais por compatibilidade, mas as ligamos ao state
-    is_paused = {"value": False}   # compat layer; sincronizado com state
-    is_running = {"value": False}  # compat layer; sincronizado with state
 
     pause_btn = ft.ElevatedButton(text="Pausar", width=175)
     resume_btn = ft.ElevatedButton(text="Continuar", width=175)
@@ -210,15 +264,13 @@ def main(page: ft.Page):
     min_delay_field = ft.TextField(label="Delay mínimo (s)", value="3", width=175, border_radius=15)
     max_delay_field = ft.TextField(label="Delay máximo (s)", value="7", width=175, border_radius=15)
 
-    # Funções dos botões pausa/continuar (agora atualizam state também)
+    # Funções dos botões pausa/continuar
     def on_pause(e):
-        state["is_paused"] = True
-        is_paused["value"] = True
+        state.is_paused = True
         safe_update()
 
     def on_resume(e):
-        state["is_paused"] = False
-        is_paused["value"] = False
+        state.is_paused = False
         safe_update()
 
     pause_btn.on_click = on_pause
@@ -240,144 +292,360 @@ def main(page: ft.Page):
             mx = mn
         return mn, mx
 
-    # Loop de disparo em lote, respeitando pausa e delays configurados
-    def disparar_em_lote(e):
-        # sincroniza camada compatível
-        if state["is_running"]:
-            status.value = "⚠️ Disparo já em execução."
-            safe_update()
+    # Ritmo adaptativo (AIMD): os delays acima passam a ser limites rígidos
+    adaptive_switch = ft.Switch(label="Delay adaptativo", value=False)
+    adaptive_text = ft.Text(value="", size=12, color=ft.Colors.GREY_600)
+    rate_ctrl = AdaptiveRate(*get_delays())
+
+    def scheduler_delays():
+        mn, mx = get_delays()
+        if not adaptive_switch.value:
+            return mn, mx
+        rate_ctrl.set_bounds(mn, mx)
+        d = rate_ctrl.next_delay()
+        return d, d
+
+    def _refresh_adaptive():
+        if not adaptive_switch.value:
+            adaptive_text.value = ""
+            return
+        p95 = rate_ctrl.p95()
+        adaptive_text.value = (
+            f"Ritmo atual: {rate_ctrl.rate * 60:.1f} msg/min"
+            + (f" | p95 latência: {p95:.2f}s" if p95 is not None else "")
+        )
+
+    # Campos de agendamento (campanhas na fila do scheduler)
+    campanha_field = ft.TextField(label="Nome da campanha", width=175, border_radius=15)
+    prioridade_field = ft.TextField(label="Prioridade", value="1", width=175, border_radius=15)
+    inicio_field = ft.TextField(label="Início (AAAA-MM-DD HH:MM)", width=175, border_radius=15, hint_text="vazio = agora")
+    janela_field = ft.TextField(label="Janela (HH:MM-HH:MM)", width=175, border_radius=15, hint_text="vazio = sem janela")
+    fuso_field = ft.TextField(label="Fuso da janela", value="auto", width=175, border_radius=15, hint_text="auto = fuso do destinatário")
+    dias_uteis_switch = ft.Switch(label="Somente dias úteis", value=False)
+    fila_text = ft.Text(value="", size=12, color=ft.Colors.GREY_600)
+
+    metrics_text = ft.Text(value="", size=12, color=ft.Colors.GREY_600)
+
+    def _refresh_metrics():
+        snap = state.snapshot()
+        metrics_text.value = f"Enviadas: {snap.total_sent}  |  Sucessos: {snap.successes}  |  Falhas: {snap.failures}"
+
+    def _refresh_fila():
+        pendentes = scheduler.pending()
+        if not pendentes:
+            fila_text.value = ""
             return
+        fila_text.value = "Fila: " + " | ".join(
+            f"{c.name} ({c.successes + c.failures}/{c.size}, prioridade {c.priority})" for c in pendentes
+        )
 
-        linhas = arquivo_txt.value.strip().split("\n")
-        if len(linhas) < 2:
+    # Processa uma linha de uma campanha; chamado pela thread do scheduler
+    def process_row(campaign, line_no, dados):
+        i = campaign.successes + campaign.failures + 1
+        try:
+            mensagem = render(campaign.template, campaign.lookup.enrich(dados) if campaign.lookup is not None else dados)
+        except Exception as err:
+            campaign.skipped += 1
+            status.value = f"❌ Erro ao formatar mensagem na linha {line_no}: {err}"
+            safe_update()
+            return False
+
+        from chatwoot_config.chatwoot_client import dispatch_message
+        try:
+            msg_id = dispatch_message(
+                name=dados.get("nome", ""),
+                email=dados.get("email", ""),
+                phone=dados.get("telefone", ""),
+                cnpj=dados.get("cnpj", ""),
+                content=mensagem,
+                inbox_id=campaign.inbox_id,
+                attachment=campaign.attachment,
+                # cada tentativa HTTP alimenta o ritmo adaptativo (latência sem as esperas de retry)
+                on_attempt=rate_ctrl.record_attempt
+            )
+            rate_ctrl.record_success()
+            status.value = f"✅ [{campaign.name}] {i}/{campaign.size} enviado: {dados.get('nome','')} (ID: {msg_id})"
+            entry_status = "sucesso"
+        except Exception as err:
+            status.value = f"❌ [{campaign.name}] Erro ao enviar para {dados.get('nome','')}: {err}"
+            entry_status = "falha"
+
+        entry = _make_entry_from_fields(dados.get("nome", ""), dados.get("email", ""), dados.get("telefone", ""), dados.get("cnpj", ""), entry_status)
+        entry.extra = {k: v for k, v in dados.items() if k not in BASE_COLUMNS}
+        if entry_status == "sucesso":
+            entry.message_id = msg_id
+            delivery_tracker.track(entry)
+        # contadores globais e da campanha atualizados juntos (atômico)
+        state.record(entry, ok=entry_status == "sucesso", run=campaign)
+        campaign.entries.append(entry)
+        _refresh_metrics()
+        _refresh_fila()
+        _refresh_adaptive()
+        safe_update()
+        return True
+
+    # Campanha concluída: monta o relatório desta execução
+    def on_campaign_finish(campaign):
+        report = {
+            "ts": time.time(),
+            "name": campaign.name,
+            "total": len(campaign.entries),
+            "successes": campaign.successes,
+            "failures": campaign.failures,
+            "entries": campaign.entries,
+            "template": campaign.template,
+            "inbox_id": campaign.inbox_id,
+            "attachment": campaign.attachment.path if campaign.attachment is not None else None,
+            "parent_id": campaign.parent_id,
+            "lookup": [campaign.lookup.source, campaign.lookup.kind] if campaign.lookup is not None else None,
+        }
+        delivery_tracker.attach_report(campaign.entries, report)
+        state.add_report(report)
+        _persist_reports()
+        if campaign.attachment is not None:
+            # solta o mmap (no Windows o arquivo fica travado enquanto mapeado)
+            from chatwoot_config.attachments import release_attachment
+            release_attachment(campaign.attachment)
+
+        if not scheduler.pending():
+            state.is_running = False
+            state.is_paused = False
+        status.value = f"✅ Campanha {campaign.name} finalizada ({campaign.processed} linhas processadas)."
+        _refresh_fila()
+        safe_update()
+
+    def on_scheduler_status(texto):
+        status.value = texto
+        safe_update()
+
+    scheduler = CampaignScheduler(
+        process_row=process_row,
+        get_delays=scheduler_delays,
+        is_paused=lambda: state.is_paused,
+        on_finish=on_campaign_finish,
+        on_status=on_scheduler_status,
+    )
+
+    def _recipient_tz(dados):
+        try:
+            from chatwoot_config.chatwoot_client import phone_timezone
+            return phone_timezone(dados.get("telefone", ""))
+        except Exception:
+            return None
+
+    # Monta a campanha a partir do conteúdo colado e coloca na fila do scheduler
+    def _enqueue(agendada: bool):
+        try:
+            cabecalho, linhas = parse_lote(arquivo_txt.value)
+        except ValueError:
             status.value = "❌ Arquivo inválido ou vazio."
             safe_update()
             return
 
-        # marca execução no state e na compat layer
-        state["is_running"] = True
-        is_running["value"] = True
-        state["is_paused"] = False
-        is_paused["value"] = False
+        # mesmo pipeline da pré-visualização: linhas inválidas e telefones repetidos ficam de fora
+        aceitas, descartadas = select_rows(validate_rows(cabecalho, linhas))
+        rows = [(line_no, dados) for line_no, dados, _phone in aceitas]
+        ignoradas = len(descartadas)
+        duplicadas = sum(1 for d in descartadas if d[2] == DUPLICADO)
+        if not rows:
+            status.value = "❌ Nenhuma linha válida no arquivo."
+            safe_update()
+            return
+
+        try:
+            prioridade = max(1, int(prioridade_field.value or 1))
+        except ValueError:
+            prioridade = 1
+
+        start_at, window, tz = 0.0, None, None
+        if agendada:
+            try:
+                if (inicio_field.value or "").strip():
+                    start_at = time.mktime(time.strptime(inicio_field.value.strip(), "%Y-%m-%d %H:%M"))
+                if (janela_field.value or "").strip():
+                    window = SendWindow.parse(janela_field.value, business_days=dias_uteis_switch.value)
+                    tz = (fuso_field.value or "").strip() or "auto"
+            except ValueError as err:
+                status.value = f"❌ Agendamento inválido: {err}"
+                safe_update()
+                return
+
+        try:
+            lookup = _load_lookup(tabela_field.value, tabela_chave.value)
+        except (OSError, ValueError) as err:
+            status.value = f"❌ Tabela de enriquecimento inválida: {err}"
+            safe_update()
+            return
+
+        nome = (campanha_field.value or "").strip() or f"Lote {time.strftime('%H:%M:%S')}"
+        campaign = Campaign(
+            name=nome,
+            rows=rows,
+            template=lote_msg_template.value,
+            start_at=start_at,
+            window=window,
+            tz=tz,
+            priority=prioridade,
+            inbox_id=inbox_dropdown.value or None,
+            lookup=lookup,
+        )
+        campaign.skipped = ignoradas
+        try:
+            campaign.prepare(_recipient_tz if tz == "auto" else None)
+        except ValueError as err:
+            status.value = f"❌ Agendamento inválido: {err}"
+            safe_update()
+            return
 
-        status.value = "Iniciando disparo em lote..."
+        # anexo carregado por último: a partir daqui a campanha é dona do mapeamento
+        # e o libera em on_campaign_finish
+        if (anexo_field.value or "").strip():
+            try:
+                from chatwoot_config.attachments import load_attachment
+                campaign.attachment = load_attachment(anexo_field.value.strip())
+            except (OSError, ValueError) as err:
+                status.value = f"❌ Anexo inválido: {err}"
+                safe_update()
+                return
+
+        state.is_running = True
+        scheduler.submit(campaign)
+
+        aviso = f" ({ignoradas} linhas ignoradas, {duplicadas} com telefone repetido)" if ignoradas else ""
+        if start_at > time.time():
+            status.value = f"🕒 Campanha {nome} agendada para {time.strftime('%Y-%m-%d %H:%M', time.localtime(start_at))}{aviso}."
+        else:
+            status.value = f"Campanha {nome} adicionada à fila{aviso}."
+        _refresh_fila()
         safe_update()
 
-        cabecalho = [h.strip() for h in linhas[0].strip().split(";")]
-        total = len(linhas) - 1
+    # Disparo imediato: campanha sem agendamento, intercalada com as demais da fila
+    def disparar_em_lote(e):
+        _enqueue(agendada=False)
+
+    def agendar_campanha(e):
+        _enqueue(agendada=True)
+
+    # Reenvio de falhas: nova campanha direto das falhas indexadas de um relatório,
+    # pulando telefones que já tiveram sucesso em execuções posteriores.
+    # Retorna (mensagem, enfileirado).
+    def rerun_failures(report):
+        # reenvio deste relatório ainda na fila/em execução: as falhas só deixam de ser
+        # pendentes quando ele termina, então enfileirar de novo duplicaria mensagens
+        if any(c.parent_id == report.get("id") for c in scheduler.pending()):
+            return "⏳ O reenvio deste relatório ainda está em andamento.", False
+        entries = state.pending_failures(report.get("id"))
+        if not entries:
+            return "Nenhuma falha pendente para reenviar neste relatório.", False
+
+        lookup = None
+        if report.get("lookup"):
+            try:
+                lookup = _load_lookup(*report["lookup"])
+            except (OSError, ValueError) as err:
+                return f"❌ Tabela de enriquecimento original indisponível: {err}", False
 
-        def worker():
-            # variáveis locais para construir o relatório desta execução
-            successes_before = state.get("successes", 0)
-            failures_before = state.get("failures", 0)
-            current_entries = []
+        attachment = None
+        if report.get("attachment"):
             try:
-                for i, linha in enumerate(linhas[1:], start=1):
-                    # se houve pausa, aguarda até que seja despausado
-                    while state["is_paused"]:
-                        status.value = f"⏸️ Pausado em {i-1}/{total}. Aguardando continuar..."
-                        safe_update()
-                        time.sleep(0.2)  # espera curta para permitir reatividade
-
-                    if not linha.strip():
-                        # linha vazia
-                        status.value = f"⚠️ Linha {i+1} ignorada: vazia."
-                        safe_update()
-                        continue
-
-                    campos = [c.strip() for c in linha.strip().split(";")]
-                    if len(campos) != len(cabecalho):
-                        status.value = f"⚠️ Linha {i+1} ignorada: número de campos incorreto."
-                        safe_update()
-                        continue
-
-                    dados = dict(zip(cabecalho, campos))
-                    try:
-                        mensagem = lote_msg_template.value.format(**dados)
-                    except Exception as err:
-                        status.value = f"❌ Erro ao formatar mensagem na linha {i+1}: {err}"
-                        safe_update()
-                        continue
-
-                    try:
-                        msg_id = dispatch_message(
-                            name=dados.get("nome", ""),
-                            email=dados.get("email", ""),
-                            phone=dados.get("telefone", ""),
-                            cnpj=dados.get("cnpj", ""),
-                            content=mensagem
-                        )
-                        status.value = f"✅ {i}/{total} enviado: {dados.get('nome','')} (ID: {msg_id})"
-                        entry_status = "sucesso"
-                        # atualiza estado de relatórios
-                        state["total_sent"] += 1
-                        state["successes"] += 1
-                    except Exception as err:
-                        status.value = f"❌ Erro ao enviar para {dados.get('nome','')}: {err}"
-                        entry_status = "falha"
-                        state["total_sent"] += 1
-                        state["failures"] += 1
-
-                    entry = {
-                        "to": dados.get("nome", ""),
-                        "email": dados.get("email", ""),
-                        "phone": dados.get("telefone", ""),
-                        "cnpj": dados.get("cnpj", ""),
-                        "status": entry_status,
-                        "time": time.strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    state["recent_logs"].insert(0, entry)
-                    state["recent_logs"] = state["recent_logs"][:200]
-                    current_entries.append(entry)
-
-                    # limita tamanho do log
-                    state["recent_logs"] = state["recent_logs"][:200]
-                    safe_update()
-
-                    # após cada envio, aguarda intervalo aleatório entre min e max,
-                    # respeitando pausa se acionada durante a espera
-                    mn, mx = get_delays()
-                    wait = random.uniform(mn, mx)
-                    waited = 0.0
-                    # subdivide espera em fatias pequenas para permitir pausa rápida
-                    slice_dt = 0.2
-                    while waited < wait:
-                        if state["is_paused"]:
-                            status.value = f"⏸️ Pausado após {i}/{total}. Aguardando continuar..."
-                            safe_update()
-                            # esperar enquanto estiver pausado
-                            while state["is_paused"]:
-                                time.sleep(0.2)
-                        else:
-                            time.sleep(slice_dt)
-                            waited += slice_dt
+                from chatwoot_config.attachments import load_attachment
+                attachment = load_attachment(report["attachment"])
+            except (OSError, ValueError) as err:
+                return f"❌ Anexo original indisponível: {err}", False
+
+        campaign = Campaign(
+            name=f"Reenvio #{report.get('id')} {report.get('name', '')}".strip(),
+            rows=[(n, e.row()) for n, e in enumerate(entries, start=1)],
+            template=report.get("template") or lote_msg_template.value,
+            inbox_id=report.get("inbox_id") or inbox_dropdown.value or None,
+            attachment=attachment,
+            parent_id=report.get("id"),
+            lookup=lookup,
+        )
+        campaign.prepare()
+        state.is_running = True
+        scheduler.submit(campaign)
+        status.value = f"🔁 {campaign.name}: {campaign.size} falhas adicionadas à fila."
+        _refresh_fila()
+        safe_update()
+        return status.value, True
 
+    # Pré-visualização (dry-run): mesmo pipeline do lote, sem enviar nada
+    resolve_contacts_switch = ft.Switch(label="Consultar contatos (somente leitura)", value=False)
+    preview_text = ft.Text(value="", size=12, selectable=True)
+    is_previewing = {"value": False}
+
+    def pre_visualizar(e):
+        if is_previewing["value"]:
+            return
+        is_previewing["value"] = True
+        status.value = "🔎 Gerando pré-visualização do lote..."
+        safe_update()
+
+        def worker():
+            try:
+                lookup = _load_lookup(tabela_field.value, tabela_chave.value)
+            except (OSError, ValueError) as err:
+                status.value = f"❌ Tabela de enriquecimento inválida: {err}"
+                is_previewing["value"] = False
+                safe_update()
+                return
+            try:
+                result = preview_batch(
+                    arquivo_txt.value,
+                    lote_msg_template.value,
+                    delays=get_delays(),
+                    resolve_contacts=resolve_contacts_switch.value,
+                    lookup=lookup,
+                )
+            except ValueError:
+                status.value = "❌ Arquivo inválido ou vazio."
+                return
+            except Exception as err:
+                status.value = f"❌ Erro na pré-visualização: {err}"
+                return
             finally:
-                # monta relatório desta execução
-                successes_delta = state.get("successes", 0) - successes_before
-                failures_delta = state.get("failures", 0) - failures_before
-                report = {
-                    "ts": time.time(),
-                    "total": len(current_entries),
-                    "successes": successes_delta,
-                    "failures": failures_delta,
-                    "entries": current_entries
-                }
-                state["reports"].insert(0, report)
-                state["reports"] = state["reports"][:500]  # limitar
-                _persist_reports()
-
-                state["is_running"] = False
-                is_running["value"] = False
-                state["is_paused"] = False
-                is_paused["value"] = False
-                status.value = f"✅ Disparo em lote finalizado ({total} linhas processadas)."
+                is_previewing["value"] = False
                 safe_update()
 
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
+            entries = [
+                _make_entry_from_fields(
+                    r.dados.get("nome", ""), r.dados.get("email", ""), r.phone or r.dados.get("telefone", ""),
+                    r.dados.get("cnpj", ""), f"{r.status}: {r.reason}" if r.reason else r.status
+                )
+                for r in result.rows
+            ]
+            # relatório de simulação: fica só em memória (não é persistido)
+            state.add_report({
+                "ts": time.time(),
+                "name": "Pré-visualização",
+                "dry_run": True,
+                "total": result.total,
+                "successes": result.to_send,
+                "failures": result.invalid + result.duplicates,
+                "entries": entries,
+            })
+
+            mn, mx = result.estimated_seconds
+            linhas = [
+                f"Linhas: {result.total} | A enviar: {result.to_send} | Inválidas: {result.invalid} | Duplicadas: {result.duplicates}",
+                f"Duração estimada: {format_duration(mn)} a {format_duration(mx)}",
+            ]
+            if result.existing_contacts is not None:
+                linhas.append(f"Contatos já existentes no Chatwoot: {result.existing_contacts}")
+            exemplos = [r for r in result.rows if r.status == SIMULADO][:3]
+            linhas += [f"Linha {r.line_no} → {r.phone}: {r.message}" for r in exemplos]
+            erros = [r for r in result.rows if r.status != SIMULADO][:5]
+            linhas += [f"Linha {r.line_no}: {r.status} ({r.reason})" for r in erros]
+            preview_text.value = "\n".join(linhas)
+            status.value = "✅ Pré-visualização concluída (nenhuma mensagem enviada). Detalhes em Relatórios."
+            safe_update()
+
+        threading.Thread(target=worker, daemon=True).start()
 
     disparar_btn = ft.ElevatedButton("Disparar mensagens em lote", on_click=disparar_em_lote, width=360)
+    agendar_btn = ft.ElevatedButton("Agendar campanha", on_click=agendar_campanha, width=360)
+    preview_btn = ft.ElevatedButton("Pré-visualizar (dry-run)", on_click=pre_visualizar, width=360)
 
     # Containers das duas seções com altura fixa
     # Ajuste: Columns internas usam scroll=ft.ScrollMode.AUTO para rolagem independente
@@ -410,10 +678,24 @@ def main(page: ft.Page):
             ft.Text("4. Aperte em Disparar mensagens em lote, e acompanhe o resultado na parte inferior", size=12, weight="regular"),
             arquivo_txt,
             ft.Row([min_delay_field, max_delay_field], spacing=10),
+            ft.Row([adaptive_switch], spacing=10),
+            adaptive_text,
             ft.Row([pause_btn, resume_btn], spacing=10),
             ft.Row([disparar_btn], spacing=10),
+            ft.Row([preview_btn], spacing=10),
+            resolve_contacts_switch,
+            preview_text,
+            ft.Text("Agendamento", size=18, weight="bold"),
+            ft.Row([campanha_field, prioridade_field], spacing=10),
+            ft.Row([inicio_field, janela_field], spacing=10),
+            ft.Row([fuso_field, dias_uteis_switch], spacing=10),
+            ft.Row([agendar_btn], spacing=10),
+            fila_text,
+            metrics_text,
             ft.Text("Editar Mensagem Padrão", size=18, weight="bold"),
             lote_msg_template,
+            anexo_field,
+            ft.Row([tabela_field, tabela_chave], spacing=10),
         ], spacing=15, scroll=ft.ScrollMode.AUTO, expand=True, alignment=ft.MainAxisAlignment.START),
         expand=True,
         height=container_height,
@@ -439,21 +721,23 @@ def main(page: ft.Page):
 
     # Navigation: callback que altera o state e reconstrói o body
     def on_nav_change(new_index: int):
-        state["nav_index"] = new_index
+        ui_state["nav_index"] = new_index
         nav_component.selected_index = new_index
         build_body()
 
-    nav_component = AppNavigation(on_change=on_nav_change, selected_index=state["nav_index"])
+    nav_component = AppNavigation(on_change=on_nav_change, selected_index=ui_state["nav_index"])
 
     # função que monta o conteúdo principal (Home ou Relatórios) e adiciona a NavigationBar
     def build_body():
         page.controls.clear()
         # header deixamos dentro de home_view para manter exatamente o layout atual na tela inicial
-        if state["nav_index"] == 0:
+        if ui_state["nav_index"] == 0:
             page.controls.append(home_view())
         else:
             # chama reports.build_reports, que lê o state para mostrar métricas
-            page.controls.append(build_reports(state, page))
+            from pages.reports import build_reports
+            ui_state["reports_view"] = build_reports(state, page, on_rerun=rerun_failures)
+            page.controls.append(ui_state["reports_view"])
         # adiciona a navigation bar fixa embaixo
         page.controls.append(nav_component.build())
         safe_update()
@@ -469,16 +753,48 @@ def main(page: ft.Page):
         # rebuild body para aplicar cores corretamente
         build_body()
 
-    # tenta carregar relatórios persistidos (se houver)
+    def _load_inboxes(refresh=False):
+        try:
+            from chatwoot_config.chatwoot_client import INBOX_ID
+            from chatwoot_config.discovery import list_inboxes, validate_inbox
+            inboxes, _from_cache = list_inboxes(refresh=refresh)
+        except Exception as err:
+            status.value = f"⚠️ Não foi possível listar as caixas de entrada: {err}"
+            safe_update()
+            return
+        inbox_dropdown.options = [
+            ft.dropdown.Option(key=str(i["id"]), text=f"{i['name']} ({i['channel_type']}, {i['health']})")
+            for i in inboxes
+        ]
+        if not inbox_dropdown.value and INBOX_ID:
+            inbox_dropdown.value = str(INBOX_ID)
+        ok, msg = validate_inbox(inbox_dropdown.value, inboxes)
+        if not ok:
+            status.value = f"⚠️ {msg}"
+        safe_update()
+
+    # inicializa a UI
+    build_body()
+
+    # caixas de entrada: carregadas em segundo plano (cache em disco, sem travar a abertura)
+    threading.Thread(target=_load_inboxes, daemon=True).start()
+
+    # tenta carregar relatórios persistidos (se houver); feito após o primeiro
+    # desenho, já que a tela inicial não depende deles
     try:
         saved = page.client_storage.get("dispatchr_reports")
         if saved:
-            state["reports"] = saved
+            state.replace_reports(ReportStore.from_list(saved))
+            delivery_tracker.track_reports(state.reports)
     except Exception:
         pass
 
-    # inicializa a UI
-    build_body()
+    # receptor de webhooks de entrega (só sobe se DISPATCHR_WEBHOOK_PORT estiver no .env)
+    try:
+        start_webhook_server(delivery_tracker)
+    except (OSError, ValueError) as err:
+        status.value = f"⚠️ Webhook de entrega indisponível: {err}"
+        safe_update()
 
 if __name__ == "__main__":
     ft.app(target=main, assets_dir="assets")
@@ -0,0 +1,227 @@
+# benchmarks/soak.py
+"""
+Teste de carga/soak headless da UI: roda main(page) com uma página falsa e um
+Chatwoot simulado, dispara N mil linhas e registra ao longo do tempo:
+memória (tracemalloc e RSS), quantidade e latência de page.update(), threads ativas
+e linhas processadas.
+
+Uso (a partir da pasta dispatchr, com as dependências do app instaladas):
+    python benchmarks/soak.py --rows 5000 --batches 5 --latency 0.01 --error-rate 0.02
+    python benchmarks/soak.py --rows 50000 --reports-every 30 --out soak.csv
+
+Nenhuma requisição real é feita: dispatch_message e a descoberta de caixas de
+entrada são substituídos por versões simuladas apenas dentro deste processo.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+class FakeStorage:
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        self._data[key] = value
+
+class FakePage:
+    """
+    Página Flet mínima para rodar main(page) sem janela.
+    update() percorre a árvore de controles (custo proporcional ao tamanho da tela,
+    como o diff feito pelo Flet) e registra contagem e latência.
+    """
+
+    def __init__(self):
+        self.title = ""
+        self.theme_mode = None
+        self.theme = None
+        self.padding = 0
+        self.snack_bar = None
+        self.window = SimpleNamespace(width=0, height=0)
+        self.controls = []
+        self.client_storage = FakeStorage()
+        self._lock = threading.Lock()
+        self.update_count = 0
+        self.update_latencies = []
+        self.last_tree_size = 0
+
+    def update(self):
+        t0 = time.perf_counter()
+        size = sum(1 for _ in walk(self.controls))
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self.update_count += 1
+            self.update_latencies.append(dt)
+            self.last_tree_size = size
+
+    def drain_latencies(self):
+        with self._lock:
+            lat, self.update_latencies = self.update_latencies, []
+        return lat
+
+def walk(controls):
+    for c in controls or []:
+        if c is None:
+            continue
+        yield c
+        # Column/Row (controls), DataTable (rows) e DataRow (cells)
+        for attr in ("controls", "rows", "cells"):
+            filhos = getattr(c, attr, None)
+            if isinstance(filhos, list):
+                yield from walk(filhos)
+        content = getattr(c, "content", None)
+        if content is not None:
+            yield from walk([content])
+
+def find(page, predicate):
+    for c in walk(page.controls):
+        try:
+            if predicate(c):
+                return c
+        except Exception:
+            continue
+    raise LookupError("controle não encontrado na página")
+
+class SimulatedChatwoot:
+    """dispatch_message simulado: latência aleatória e uma taxa de falhas configurável."""
+
+    def __init__(self, latency: float, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def dispatch_message(self, name, email, phone, cnpj, content, **kwargs):
+        time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        with self._lock:
+            self.calls += 1
+        if random.random() < self.error_rate:
+            raise RuntimeError("Falha simulada do Chatwoot (500)")
+        return next(self._ids)
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+def make_batch(rows: int, offset: int) -> str:
+    linhas = ["nome;email;telefone;cnpj"]
+    for i in range(offset, offset + rows):
+        linhas.append(f"Empresa {i};contato{i}@example.com;1199{i % 10_000_000:07d};12.345.678/0001-{i % 100:02d}")
+    return "\n".join(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test headless do dispatchr")
+    parser.add_argument("--rows", type=int, default=5000, help="total de linhas enviadas")
+    parser.add_argument("--batches", type=int, default=1, help="lotes disparados em sequência")
+    parser.add_argument("--latency", type=float, default=0.005, help="latência média simulada (s)")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--sample", type=float, default=1.0, help="intervalo entre amostras (s)")
+    parser.add_argument("--reports-every", type=float, default=0.0,
+                        help="alterna para a aba Relatórios a cada N s (0 = nunca)")
+    parser.add_argument("--timeout", type=float, default=6 * 3600)
+    parser.add_argument("--out", default="", help="CSV com as amostras")
+    args = parser.parse_args()
+
+    import chatwoot_config.chatwoot_client as client
+    import chatwoot_config.discovery as discovery
+    fake = SimulatedChatwoot(args.latency, args.error_rate)
+    client.dispatch_message = fake.dispatch_message
+    discovery.list_inboxes = lambda refresh=False, ttl=0: ([{
+        "id": 1, "name": "Simulada", "channel_type": "Channel::Whatsapp", "phone_number": "", "health": "ok",
+    }], True)
+
+    import app
+
+    tracemalloc.start()
+    page = FakePage()
+    app.main(page)
+
+    arquivo = find(page, lambda c: getattr(c, "label", None) == "Conteúdo do arquivo .txt")
+    min_delay = find(page, lambda c: getattr(c, "label", None) == "Delay mínimo (s)")
+    max_delay = find(page, lambda c: getattr(c, "label", None) == "Delay máximo (s)")
+    disparar = find(page, lambda c: getattr(c, "text", None) == "Disparar mensagens em lote")
+    nav = find(page, lambda c: hasattr(c, "on_change") and type(c).__name__ == "NavigationBar")
+    min_delay.value = max_delay.value = "0"
+
+    por_lote = max(1, args.rows // args.batches)
+    total = por_lote * args.batches
+    amostras = []
+    t_start = time.time()
+    proximo_lote = 0
+    ultima_troca = t_start
+    aba = 0
+
+    print(f"Soak: {total} linhas em {args.batches} lote(s), latência ~{args.latency}s, falhas {args.error_rate:.0%}")
+    while True:
+        # dispara o próximo lote quando o anterior terminou
+        if proximo_lote < args.batches and fake.calls >= proximo_lote * por_lote:
+            arquivo.value = make_batch(por_lote, proximo_lote * por_lote)
+            disparar.on_click(None)
+            proximo_lote += 1
+
+        if args.reports_every and time.time() - ultima_troca >= args.reports_every:
+            aba = 1 - aba
+            nav.on_change(SimpleNamespace(control=SimpleNamespace(selected_index=aba)))
+            ultima_troca = time.time()
+
+        time.sleep(args.sample)
+        lat = page.drain_latencies()
+        atual, pico = tracemalloc.get_traced_memory()
+        amostra = {
+            "t": round(time.time() - t_start, 2),
+            "rows_done": fake.calls,
+            "py_mem_mb": round(atual / 1e6, 2),
+            "py_peak_mb": round(pico / 1e6, 2),
+            "rss_mb": round(rss_mb(), 2),
+            "updates": len(lat),
+            "update_p50_ms": round(statistics.median(lat) * 1000, 3) if lat else 0.0,
+            "update_p95_ms": round(sorted(lat)[int(0.95 * (len(lat) - 1))] * 1000, 3) if lat else 0.0,
+            "tree_size": page.last_tree_size,
+            "threads": threading.active_count(),
+        }
+        amostras.append(amostra)
+        print("  ".join(f"{k}={v}" for k, v in amostra.items()))
+
+        terminou = fake.calls >= total and proximo_lote >= args.batches and reports_saved(page) >= args.batches
+        if terminou or time.time() - t_start > args.timeout:
+            break
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(amostras[0].keys()))
+            writer.writeheader()
+            writer.writerows(amostras)
+
+    primeira, ultima = amostras[0], amostras[-1]
+    print(
+        f"\nResumo: {ultima['rows_done']} linhas em {ultima['t']}s | "
+        f"memória Python {primeira['py_mem_mb']} → {ultima['py_mem_mb']} MB (pico {ultima['py_peak_mb']}) | "
+        f"RSS {primeira['rss_mb']} → {ultima['rss_mb']} MB | "
+        f"updates totais {page.update_count} | threads {primeira['threads']} → {ultima['threads']}"
+    )
+
+def reports_saved(page) -> int:
+    """Cada lote concluído persiste seu relatório no client_storage."""
+    return len(page.client_storage.get("dispatchr_reports") or [])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/startup.py
+"""
+Mede o tempo de importação dos módulos carregados na abertura do app.
+
+Uso (a partir da pasta dispatchr):
+    python benchmarks/startup.py [--runs 10] [--top 15]
+
+Cada medição roda em um processo Python novo (sem cache de módulos em memória),
+reportando o tempo total de `import <módulo>` e os módulos mais caros segundo
+`python -X importtime`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    "app",
+    "pages.reports",
+    "chatwoot_config.chatwoot_client",
+]
+
+def time_import(module: str) -> float:
+    code = (
+        "import time; t0 = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - t0)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def top_imports(module: str, top: int):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    linhas = []
+    for linha in out.stderr.splitlines():
+        # formato: "import time: self [us] | cumulative | imported package"
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _self_us, cumul_us, nome = [p.strip() for p in linha[len("import time:"):].split("|")]
+        linhas.append((int(cumul_us), nome))
+    return sorted(linhas, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do dispatchr")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in TARGETS:
+        try:
+            tempos = [time_import(module) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as err:
+            print(f"{module}: falha ao importar\n{err.stderr}")
+            continue
+        print(
+            f"{module}: mediana {statistics.median(tempos) * 1000:.1f} ms | "
+            f"mín {min(tempos) * 1000:.1f} ms | máx {max(tempos) * 1000:.1f} ms ({args.runs} execuções)"
+        )
+
+    print(f"\nMódulos mais caros ao importar app (top {args.top}, cumulativo):")
+    try:
+        for cumul_us, nome in top_imports("app", args.top):
+            print(f"  {cumul_us / 1000:8.1f} ms  {nome}")
+    except subprocess.CalledProcessError as err:
+        print(err.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# chatwoot_config/attachments.py
+import hashlib
+import mimetypes
+import mmap
+import os
+import threading
+import uuid
+from typing import Dict, Tuple
+
+# tamanho dos blocos entregues ao socket ao enviar o corpo multipart
+BLOCK_SIZE = 64 * 1024
+
+class Attachment:
+    """
+    Arquivo de anexo mapeado em memória (mmap), identificado pelo SHA-256 do conteúdo.
+    - O arquivo é lido/hasheado uma única vez por campanha, não por destinatário.
+    - O cabeçalho e o rodapé da parte do arquivo no multipart são montados uma vez;
+      cada envio só acrescenta os campos de texto (content, message_type).
+    - refs: campanhas usando o anexo; o mapeamento é fechado quando chega a zero
+      (ver load_attachment/release_attachment).
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.filename = os.path.basename(path)
+        self.mime = mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        with open(self.path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size == 0:
+                raise ValueError(f"Anexo vazio: {self.path}")
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        digest = hashlib.sha256()
+        view = memoryview(self.buffer)
+        for i in range(0, self.size, BLOCK_SIZE):
+            digest.update(view[i:i + BLOCK_SIZE])
+        view.release()
+        self.digest = digest.hexdigest()
+        self.refs = 0
+        self.boundary = f"dispatchr-{self.digest[:32]}"
+        safe_name = self.filename.replace('"', "'")
+        self._file_head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="attachments[]"; filename="{safe_name}"\r\n'
+            f"Content-Type: {self.mime}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+
+    def multipart(self, fields: Dict[str, str]) -> Tuple["MultipartBody", str]:
+        """Corpo multipart (campos de texto + arquivo) e o Content-Type correspondente."""
+        boundary = self.boundary
+        if any(boundary in str(v) for v in fields.values()):
+            # improvável, mas o boundary não pode aparecer no conteúdo
+            boundary = f"dispatchr-{uuid.uuid4().hex}"
+            head = self._file_head.replace(self.boundary.encode(), boundary.encode(), 1)
+            tail = self._tail.replace(self.boundary.encode(), boundary.encode(), 1)
+        else:
+            head, tail = self._file_head, self._tail
+        partes = b"".join(
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{nome}"\r\n\r\n'
+                f"{valor}\r\n"
+            ).encode("utf-8")
+            for nome, valor in fields.items()
+        )
+        body = MultipartBody([partes + head, memoryview(self.buffer), tail])
+        return body, f"multipart/form-data; boundary={boundary}"
+
+    def close(self) -> None:
+        try:
+            self.buffer.close()
+        except BufferError:
+            # ainda há um corpo de envio apontando para o mmap; ele é fechado pelo GC
+            pass
+
+class MultipartBody:
+    """
+    Corpo de requisição em streaming sobre segmentos já prontos (bytes e o mmap do arquivo).
+    Tem tamanho conhecido (Content-Length) e é lido em blocos, sem copiar o arquivo inteiro.
+    Um novo corpo deve ser criado a cada tentativa de envio.
+    """
+
+    def __init__(self, segments):
+        self._segments = list(segments)
+        self._len = sum(len(s) for s in self._segments)
+        self._seg = 0
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            size = self._len
+        out = []
+        while size > 0 and self._seg < len(self._segments):
+            seg = self._segments[self._seg]
+            chunk = seg[self._pos:self._pos + size]
+            out.append(bytes(chunk) if isinstance(chunk, memoryview) else chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+            if self._pos >= len(seg):
+                self._seg += 1
+                self._pos = 0
+        return b"".join(out)
+
+    def __iter__(self):
+        while True:
+            block = self.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+# cache de anexos em uso: caminho -> ((mtime, tamanho), hash), e hash -> Attachment
+_by_path: Dict[str, Tuple[Tuple[float, int], str]] = {}
+_by_digest: Dict[str, Attachment] = {}
+_lock = threading.Lock()
+
+def _drop(att: Attachment) -> None:
+    """Remove o anexo do cache e fecha o mapeamento (chamado com _lock)."""
+    if _by_digest.get(att.digest) is att:
+        del _by_digest[att.digest]
+    for path in [p for p, (_, d) in _by_path.items() if d == att.digest]:
+        del _by_path[path]
+    att.close()
+
+def load_attachment(path: str) -> Attachment:
+    """
+    Anexo pronto para envio, reaproveitado enquanto o arquivo não mudar.
+    Arquivos diferentes com o mesmo conteúdo compartilham o mesmo mapeamento.
+    Cada chamada conta uma referência: devolva com release_attachment() ao fim da campanha.
+    Se o arquivo mudou (mtime/tamanho), a entrada antiga sai do cache e o arquivo é relido.
+    Lança OSError/ValueError se o arquivo não puder ser usado.
+    """
+    abspath = os.path.abspath(path)
+    st = os.stat(abspath)
+    stamp = (st.st_mtime, st.st_size)
+    with _lock:
+        cached = _by_path.get(abspath)
+        if cached is not None:
+            if cached[0] == stamp and cached[1] in _by_digest:
+                att = _by_digest[cached[1]]
+                att.refs += 1
+                return att
+            # arquivo alterado: esquece a versão antiga (quem já a usa mantém sua referência)
+            del _by_path[abspath]
+            antigo = _by_digest.get(cached[1])
+            if antigo is not None and antigo.refs == 0:
+                _drop(antigo)
+    att = Attachment(abspath)
+    with _lock:
+        existente = _by_digest.get(att.digest)
+        if existente is not None:
+            att.close()
+            att = existente
+        else:
+            _by_digest[att.digest] = att
+        _by_path[abspath] = (stamp, att.digest)
+        att.refs += 1
+    return att
+
+def release_attachment(att: Attachment) -> None:
+    """Devolve uma referência; sem campanhas usando o anexo, fecha o mmap e libera o arquivo."""
+    with _lock:
+        att.refs -= 1
+        if att.refs <= 0:
+            _drop(att)
@@ -1,9 +1,14 @@
 import os
+import threading
 import time
-import requests
-import phonenumbers
+import uuid
 from dotenv import load_dotenv
 
+from core.adaptive import is_transport_error, parse_retry_after
+from core.audit import audit
+
+# requests e phonenumbers são importados no primeiro uso (dentro das funções),
+# para não pesar na abertura do app
 load_dotenv()
 
 BASE_URL   = os.getenv("CHATWOOT_BASE_URL", "").rstrip("/")
@@ -16,7 +21,79 @@ HEADERS = {
     "Content-Type":    "application/json"
 }
 
+_session = None
+# envio em andamento na thread atual: id para correlacionar as tentativas HTTP no audit log
+# e on_attempt, que recebe latência/status de cada tentativa (ritmo adaptativo)
+_dispatch = threading.local()
+# corpo de erro guardado no audit log (caracteres)
+AUDIT_BODY_LIMIT = 2000
+
+def get_session():
+    """
+    Sessão HTTP compartilhada (keep-alive + pool de conexões) para todas as chamadas.
+    Criada no primeiro uso, para não importar requests na abertura do app.
+    """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(HEADERS)
+        _session = session
+    return _session
+
+def _request(method: str, url: str, attempt: int = 1, **kwargs):
+    """
+    Chamada HTTP pela sessão compartilhada, registrada no audit log:
+    método, caminho (sem query string), status, latência, tentativa e X-Request-Id.
+    Respostas de erro (>= 400) levam o corpo (truncado) para diagnóstico.
+    Com um envio em andamento, também repassa a tentativa ao on_attempt do envio.
+    """
+    dispatch_id = getattr(_dispatch, "id", None)
+    on_attempt = getattr(_dispatch, "on_attempt", None) if dispatch_id is not None else None
+    if dispatch_id is not None:
+        _dispatch.attempts += 1
+    path = url[len(BASE_URL):] if url.startswith(BASE_URL) else url
+    t0 = time.monotonic()
+    try:
+        resp = get_session().request(method, url, **kwargs)
+    except Exception as err:
+        latency = time.monotonic() - t0
+        audit(
+            "http", dispatch_id=dispatch_id, method=method, path=path.split("?")[0], attempt=attempt,
+            latency_ms=round(latency * 1000, 1), error=f"{type(err).__name__}: {err}",
+        )
+        if on_attempt is not None:
+            on_attempt(latency, transport_error=is_transport_error(err))
+        raise
+    latency = time.monotonic() - t0
+    record = {
+        "dispatch_id": dispatch_id,
+        "method": method,
+        "path": path.split("?")[0],
+        "attempt": attempt,
+        "status": resp.status_code,
+        "latency_ms": round(latency * 1000, 1),
+        "request_id": resp.headers.get("X-Request-Id"),
+    }
+    if resp.status_code >= 400:
+        record["body"] = resp.text[:AUDIT_BODY_LIMIT]
+    audit("http", **record)
+    if on_attempt is not None:
+        on_attempt(latency, status=resp.status_code, retry_after=parse_retry_after(resp.headers.get("Retry-After")))
+    return resp
+
+class ContactError(RuntimeError):
+    """Falha ao criar/recuperar contato; guarda a última resposta HTTP recebida."""
+    def __init__(self, msg: str, response=None):
+        super().__init__(msg)
+        self.response = response
+
 def to_e164(raw: str, region: str = "BR") -> str:
+    import phonenumbers
     num = phonenumbers.parse(str(raw), region)
     return phonenumbers.format_number(num, phonenumbers.PhoneNumberFormat.E164)
 
@@ -25,9 +102,20 @@ def whatsapp_jid(phone: str, region: str = "BR") -> str:
     num  = e164.lstrip("+")
     return f"{num}@s.whatsapp.net"
 
+def phone_timezone(raw: str, region: str = "BR"):
+    """Fuso horário do destinatário a partir do telefone (None se desconhecido)."""
+    import phonenumbers
+    from phonenumbers import timezone as pn_timezone
+    try:
+        zones = pn_timezone.time_zones_for_number(phonenumbers.parse(str(raw), region))
+    except phonenumbers.NumberParseException:
+        return None
+    zones = [z for z in zones if z != pn_timezone.UNKNOWN_TIMEZONE]
+    return zones[0] if zones else None
+
 def search_contacts(query: str) -> list:
     url  = f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}/contacts/search"
-    resp = requests.get(url, headers=HEADERS, params={"q": query})
+    resp = _request("GET", url, params={"q": query})
     resp.raise_for_status()
     data = resp.json()
     if isinstance(data, dict):
@@ -78,7 +166,7 @@ def get_or_create_contact(
 
     last_body = None
     for attempt in range(1, max_attempts + 1):
-        resp = requests.post(url, headers=HEADERS, json=payload)
+        resp = _request("POST", url, attempt=attempt, json=payload)
         try:
             data = resp.json()
         except Exception:
@@ -115,22 +203,30 @@ def get_or_create_contact(
             time.sleep(delay)
 
     # after attempts, provide diagnostic
-    raise RuntimeError(
+    raise ContactError(
         f"Falha ao criar/recuperar contato após {max_attempts} tentativas. "
-        f"Último status: {resp.status_code} | Body: {last_body}"
+        f"Último status: {resp.status_code} | Body: {last_body}",
+        response=resp
     )
 
-def open_conversation(contact_id: int, source_id: str, max_retries: int = 6, base_delay: float = 0.5) -> int:
+def open_conversation(
+    contact_id: int,
+    source_id: str,
+    max_retries: int = 6,
+    base_delay: float = 0.5,
+    inbox_id=None
+) -> int:
+    import requests
     payload = {
         "source_id":  source_id,
-        "inbox_id":   INBOX_ID,
+        "inbox_id":   inbox_id or INBOX_ID,
         "contact_id": contact_id
     }
     url = f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}/conversations"
 
     last_resp = None
     for attempt in range(1, max_retries + 1):
-        resp = requests.post(url, headers=HEADERS, json=payload)
+        resp = _request("POST", url, attempt=attempt, json=payload)
         if resp.status_code in (200, 201):
             return resp.json()["id"]
         last_resp = resp
@@ -144,9 +240,14 @@ def open_conversation(contact_id: int, source_id: str, max_retries: int = 6, bas
         f"Status: {last_resp.status_code if last_resp is not None else 'nenhum'} | "
         f"Resposta: {last_resp.text if last_resp is not None else 'nenhuma'}"
     )
-    raise requests.HTTPError(msg)
+    raise requests.HTTPError(msg, response=last_resp)
 
-def send_message(conversation_id: int, content: str) -> int:
+def send_message(conversation_id: int, content: str, attachment=None) -> int:
+    """
+    Envia a mensagem na conversa.
+    - attachment: Attachment (chatwoot_config/attachments.py) enviado como multipart
+      em attachments[]; o arquivo é transmitido direto do mmap em cache.
+    """
     payload = {
         "content":      content,
         "message_type": "outgoing"
@@ -155,7 +256,11 @@ def send_message(conversation_id: int, content: str) -> int:
         f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}"
         f"/conversations/{conversation_id}/messages"
     )
-    resp = requests.post(url, headers=HEADERS, json=payload)
+    if attachment is not None:
+        body, content_type = attachment.multipart(payload)
+        resp = _request("POST", url, data=body, headers={"Content-Type": content_type})
+    else:
+        resp = _request("POST", url, json=payload)
     resp.raise_for_status()
     return resp.json()["id"]
 
@@ -167,17 +272,47 @@ def dispatch_message(
     content: str,
     max_retries: int = 6,
     base_delay: float = 0.5,
-    post_create_delay: float = 0.8
+    post_create_delay: float = 0.8,
+    inbox_id=None,
+    attachment=None,
+    on_attempt=None
 ) -> int:
     """
     Fluxo:
       1) Tenta criar/recuperar contato (com retries internos).
       2) Se o contato foi criado agora (detectado), aguarda post_create_delay.
       3) Abre conversa com retry e envia a mensagem.
+    - inbox_id: caixa de entrada da conversa (padrão: CHATWOOT_INBOX_ID do .env).
+    - attachment: anexo opcional (ver chatwoot_config/attachments.load_attachment).
+    - on_attempt: callback(latência, status=, retry_after=, transport_error=) chamado a
+      cada tentativa HTTP deste envio (ex.: AdaptiveRate.record_attempt).
+    O resultado (sucesso ou erro com detalhes) vai para o audit log, com o total de
+    tentativas HTTP; cada tentativa é registrada por _request com o mesmo dispatch_id.
     """
-    jid = whatsapp_jid(phone)
-    cid, created = get_or_create_contact(name, email, phone, jid, cnpj)
-    if created:
-        time.sleep(post_create_delay)
-    conv_id = open_conversation(cid, jid, max_retries=max_retries, base_delay=base_delay)
-    return send_message(conv_id, content)
+    _dispatch.id = uuid.uuid4().hex
+    _dispatch.attempts = 0
+    _dispatch.on_attempt = on_attempt
+    record = {"dispatch_id": _dispatch.id, "phone": phone, "cnpj": cnpj, "inbox_id": inbox_id or INBOX_ID}
+    t0 = time.monotonic()
+    try:
+        jid = whatsapp_jid(phone)
+        cid, created = get_or_create_contact(name, email, phone, jid, cnpj)
+        if created:
+            time.sleep(post_create_delay)
+        conv_id = open_conversation(cid, jid, max_retries=max_retries, base_delay=base_delay, inbox_id=inbox_id)
+        msg_id = send_message(conv_id, content, attachment=attachment)
+        record.update(outcome="sucesso", message_id=msg_id, conversation_id=conv_id, contact_id=cid)
+        return msg_id
+    except Exception as err:
+        response = getattr(err, "response", None)
+        record.update(outcome="falha", error_type=type(err).__name__, error=str(err)[:AUDIT_BODY_LIMIT])
+        if response is not None:
+            record["status"] = response.status_code
+            record["request_id"] = response.headers.get("X-Request-Id")
+        raise
+    finally:
+        record["latency_ms"] = round((time.monotonic() - t0) * 1000, 1)
+        record["http_attempts"] = _dispatch.attempts
+        audit("dispatch", **record)
+        _dispatch.id = None
+        _dispatch.on_attempt = None
@@ -1,85 +1,47 @@
+"""
+Lista as caixas de entrada da conta Chatwoot (id, canal e saúde) para configurar o .env.
+
+Uso (a partir da pasta dispatchr):
+    python -m chatwoot_config.debug_inboxes            # usa o cache (TTL de 1h)
+    python -m chatwoot_config.debug_inboxes --refresh  # força consulta à API
+    python -m chatwoot_config.debug_inboxes --test 14999999999 --inbox 3
+"""
+import argparse
 import os
-import requests
-import phonenumbers
-from dotenv import load_dotenv
-
-load_dotenv()
-
-BASE_URL   = os.getenv("CHATWOOT_BASE_URL").rstrip("/")
-API_TOKEN  = os.getenv("CHATWOOT_API_TOKEN")
-ACCOUNT_ID = os.getenv("CHATWOOT_ACCOUNT_ID")
-INBOX_ID   = os.getenv("CHATWOOT_INBOX_ID")
-
-HEADERS = {
-    "api_access_token": API_TOKEN,
-    "Content-Type":    "application/json"
-}
-
-def to_e164(raw, region="BR"):
-    n = phonenumbers.parse(str(raw), region)
-    return phonenumbers.format_number(n, phonenumbers.PhoneNumberFormat.E164)
-
-def get_or_create_contact(name, email, phone, identifier):
-    phone_e = to_e164(phone)
-    payload = {
-        "name":         name,
-        "email":        email,
-        "phone_number": phone_e,
-        "identifier":   identifier
-    }
-    url = f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}/contacts"
-    r = requests.post(url, headers=HEADERS, json=payload)
-    if r.status_code == 201:
-        return r.json()["id"]
-    if r.status_code == 422 and "taken" in r.text:
-        # busca existente
-        resp = requests.get(
-            f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}/contacts/search",
-            headers=HEADERS, params={"q": phone_e}
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatwoot_config.chatwoot_client import INBOX_ID, dispatch_message
+from chatwoot_config.discovery import list_inboxes, validate_inbox
+
+def main():
+    parser = argparse.ArgumentParser(description="Caixas de entrada disponíveis no Chatwoot")
+    parser.add_argument("--refresh", action="store_true", help="ignora o cache em disco")
+    parser.add_argument("--test", metavar="TELEFONE", help="envia uma mensagem de teste para o telefone")
+    parser.add_argument("--inbox", help="caixa usada no teste (padrão: CHATWOOT_INBOX_ID)")
+    args = parser.parse_args()
+
+    inboxes, from_cache = list_inboxes(refresh=args.refresh)
+    print(f"Caixas de entrada ({'cache' if from_cache else 'API'}):")
+    for inbox in inboxes:
+        marca = "*" if str(inbox["id"]) == str(INBOX_ID) else " "
+        print(f" {marca} {inbox['id']:>5}  {inbox['channel_type']:<24} {inbox['health']:<12} {inbox['name']} {inbox['phone_number']}")
+
+    ok, msg = validate_inbox(INBOX_ID, inboxes)
+    print(("✅ " if ok else "⚠️ ") + msg)
+
+    if args.test:
+        # Fluxo mínimo, pelo mesmo cliente usado no app
+        msg_id = dispatch_message(
+            name="Teste dispatchr",
+            email="",
+            phone=args.test,
+            cnpj="",
+            content="Mensagem de teste via Chatwoot API.",
+            inbox_id=args.inbox or INBOX_ID,
         )
-        resp.raise_for_status()
-        return resp.json()[0]["id"]
-    r.raise_for_status()
-
-def open_conversation(contact_id):
-    payload = {
-        "source_id":  contact_id,
-        "inbox_id":   INBOX_ID,
-        "contact_id": contact_id
-    }
-    url = f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}/conversations"
-    r = requests.post(url, headers=HEADERS, json=payload)
-    r.raise_for_status()
-    return r.json()["id"]
-
-def send_message(conversation_id, text):
-    payload = {
-        "content":      text,
-        "message_type": "outgoing"
-    }
-    url = (
-        f"{BASE_URL}/api/v1/accounts/{ACCOUNT_ID}"
-        f"/conversations/{conversation_id}/messages"
-    )
-    r = requests.post(url, headers=HEADERS, json=payload)
-    r.raise_for_status()
-    return r.json()
+        print(f"Mensagem enviada, ID: {msg_id}")
 
 if __name__ == "__main__":
-    # Dados do contato
-    name       = "João Example"
-    email      = "joao@example.com"
-    phone      = "14996126525"
-    identifier = "joao-ex"
-
-    # Texto a enviar
-    message = "Olá João! Esta é uma mensagem de teste via Chatwoot API."
-
-    # Fluxo mínimo
-    contact_id      = get_or_create_contact(name, email, phone, identifier)
-    conversation_id = open_conversation(contact_id)
-    sent_msg        = send_message(conversation_id, message)
-
-    print(f"Contato ID: {contact_id}")
-    print(f"Conversa ID: {conversation_id}")
-    print(f"Mensagem enviada, ID: {sent_msg['id']}")
+    main()
@@ -0,0 +1,89 @@
+# chatwoot_config/discovery.py
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from chatwoot_config import chatwoot_client as client
+
+# validade do cache de caixas de entrada (segundos)
+DEFAULT_TTL = 3600
+
+def _cache_path() -> str:
+    base = os.getenv("DISPATCHR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".dispatchr")
+    return os.path.join(base, f"inboxes_{client.ACCOUNT_ID or 'default'}.json")
+
+def _health(inbox: dict) -> str:
+    """Saúde da caixa a partir dos campos retornados pelo Chatwoot."""
+    if inbox.get("reauthorization_required"):
+        return "reautorizar"
+    if not inbox.get("channel_type"):
+        return "desconhecida"
+    return "ok"
+
+def _summarize(inbox: dict) -> Dict:
+    return {
+        "id": inbox.get("id"),
+        "name": inbox.get("name", ""),
+        "channel_type": inbox.get("channel_type", ""),
+        "phone_number": inbox.get("phone_number") or "",
+        "health": _health(inbox),
+    }
+
+def fetch_inboxes() -> List[Dict]:
+    """Lista as caixas de entrada da conta direto da API (sessão compartilhada do cliente)."""
+    url = f"{client.BASE_URL}/api/v1/accounts/{client.ACCOUNT_ID}/inboxes"
+    resp = client._request("GET", url)
+    resp.raise_for_status()
+    data = resp.json()
+    itens = data.get("payload", []) if isinstance(data, dict) else data
+    return [_summarize(i) for i in itens or [] if isinstance(i, dict)]
+
+def _read_cache() -> Optional[Dict]:
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache(inboxes: List[Dict]) -> None:
+    path = _cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "base_url": client.BASE_URL, "inboxes": inboxes}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        # sem cache em disco: segue só com o resultado da API
+        pass
+
+def list_inboxes(refresh: bool = False, ttl: float = DEFAULT_TTL) -> Tuple[List[Dict], bool]:
+    """
+    Caixas de entrada da conta, usando o cache em disco enquanto estiver dentro do TTL.
+    - Retorna (inboxes, from_cache).
+    - Se a API falhar, devolve o cache vencido (se houver) em vez de erro.
+    """
+    cached = _read_cache()
+    valido = cached and cached.get("base_url") == client.BASE_URL
+    if valido and not refresh and time.time() - cached.get("ts", 0) < ttl:
+        return cached.get("inboxes", []), True
+    try:
+        inboxes = fetch_inboxes()
+    except Exception:
+        if valido:
+            return cached.get("inboxes", []), True
+        raise
+    _write_cache(inboxes)
+    return inboxes, False
+
+def validate_inbox(inbox_id, inboxes: List[Dict]) -> Tuple[bool, str]:
+    """Confere se a caixa configurada existe na conta e está saudável."""
+    if not inbox_id:
+        return False, "CHATWOOT_INBOX_ID não configurado."
+    for inbox in inboxes:
+        if str(inbox.get("id")) == str(inbox_id):
+            if inbox.get("health") != "ok":
+                return False, f"Caixa {inbox_id} ({inbox.get('name')}) com status: {inbox.get('health')}."
+            return True, f"Caixa {inbox_id} ({inbox.get('name')}) ok."
+    return False, f"Caixa {inbox_id} não encontrada na conta {client.ACCOUNT_ID}."
@@ -0,0 +1,168 @@
+# chatwoot_config/webhooks.py
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# status do Chatwoot -> status de entrega exibido nos relatórios
+DELIVERY_LABELS = {
+    "sent": "enviada",
+    "delivered": "entregue",
+    "read": "lida",
+    "failed": "falhou",
+}
+# ordem de progresso: eventos fora de ordem não rebaixam o status (lida -> entregue)
+_RANK = {"": 0, "enviada": 1, "entregue": 2, "lida": 3, "falhou": 3}
+
+EVENTS = ("message_created", "message_updated")
+
+# limite de mensagens acompanhadas; as mais antigas saem do índice
+INDEX_LIMIT = 200_000
+# tamanho máximo do corpo de um evento (bytes); acima disso responde 413
+MAX_BODY = 1024 * 1024
+
+def _is_loopback(host: str) -> bool:
+    import ipaddress
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class DeliveryTracker:
+    """
+    Índice em memória message_id -> (entrada, relatório) dos envios feitos pelo app.
+    - track() é chamado logo após o envio; apply() a cada evento do webhook.
+    - Atualiza a entrada e os contadores de entrega do relatório de forma incremental.
+    """
+
+    def __init__(self, on_update: Callable[[object, dict], None] = lambda e, r: None, limit: int = INDEX_LIMIT):
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        self._on_update = on_update
+        self._limit = limit
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def track(self, entry, report: Optional[dict] = None) -> None:
+        if entry.message_id is None:
+            return
+        with self._lock:
+            self._index[str(entry.message_id)] = (entry, report)
+            while len(self._index) > self._limit:
+                self._index.popitem(last=False)
+
+    def attach_report(self, entries, report: dict) -> None:
+        """Liga entradas já acompanhadas ao relatório criado ao fim da campanha."""
+        counts = report.setdefault("delivery", {})
+        with self._lock:
+            for entry in entries:
+                key = str(entry.message_id)
+                if entry.message_id is not None and key in self._index:
+                    self._index[key] = (entry, report)
+                if entry.delivery:
+                    counts[entry.delivery] = counts.get(entry.delivery, 0) + 1
+
+    def track_reports(self, reports) -> None:
+        """Reconstrói o índice a partir dos relatórios persistidos (entregas ainda em aberto)."""
+        for report in reports:
+            for entry in report.get("entries", []):
+                if getattr(entry, "message_id", None) is not None and _RANK.get(entry.delivery, 0) < 3:
+                    self.track(entry, report)
+
+    def apply(self, event: dict) -> bool:
+        """Aplica um evento message_created/message_updated. Retorna True se algo mudou."""
+        if event.get("event") not in EVENTS:
+            return False
+        label = DELIVERY_LABELS.get(str(event.get("status", "")))
+        if label is None:
+            return False
+        with self._lock:
+            found = self._index.get(str(event.get("id")))
+            if found is None:
+                return False
+            entry, report = found
+            old = entry.delivery
+            if _RANK.get(label, 0) <= _RANK.get(old, 0):
+                return False
+            entry.delivery = sys.intern(label)
+            if report is not None:
+                counts = report.setdefault("delivery", {})
+                if old:
+                    counts[old] = max(counts.get(old, 0) - 1, 0)
+                counts[label] = counts.get(label, 0) + 1
+            if _RANK[label] >= 3:
+                # status final: não precisa mais ficar no índice
+                self._index.pop(str(event.get("id")), None)
+        self._on_update(entry, report)
+        return True
+
+def start_webhook_server(tracker: DeliveryTracker, port: int = None, host: str = None, token: str = None):
+    """
+    Sobe o receptor de webhooks em uma thread daemon.
+    - Configuração via .env: DISPATCHR_WEBHOOK_PORT, DISPATCHR_WEBHOOK_HOST, DISPATCHR_WEBHOOK_TOKEN.
+    - Escuta só em 127.0.0.1 por padrão; para expor na rede (host diferente de loopback)
+      o token é obrigatório.
+    - No Chatwoot, aponte o webhook (eventos message_created/message_updated) para
+      http://<host>:<porta>/?token=<token>.
+    Retorna o servidor, ou None se nenhuma porta estiver configurada.
+    Lança ValueError se o host não for loopback e não houver token.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    port = port or int(os.getenv("DISPATCHR_WEBHOOK_PORT", "0") or 0)
+    if not port:
+        return None
+    host = host or os.getenv("DISPATCHR_WEBHOOK_HOST", "127.0.0.1")
+    token = token if token is not None else os.getenv("DISPATCHR_WEBHOOK_TOKEN", "")
+    if not token and not _is_loopback(host):
+        raise ValueError(f"DISPATCHR_WEBHOOK_TOKEN é obrigatório para escutar em {host}")
+
+    # http.server só é carregado quando o webhook está habilitado
+    import hmac
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class DeliveryWebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            recebido = parse_qs(urlparse(self.path).query).get("token", [""])[0]
+            if token and not hmac.compare_digest(recebido.encode(), token.encode()):
+                self.send_response(403)
+                self.end_headers()
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length > MAX_BODY:
+                self.send_response(413)
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                return
+            try:
+                if length < 0:
+                    raise ValueError("Content-Length inválido")
+                event = json.loads(self.rfile.read(length) or b"{}")
+            except Exception:
+                self.send_response(400)
+                self.end_headers()
+                return
+            # responde rápido; o Chatwoot não espera processamento
+            self.send_response(200)
+            self.end_headers()
+            if isinstance(event, dict):
+                tracker.apply(event)
+
+        def log_message(self, format, *args):
+            # sem log por requisição no console do app
+            pass
+
+    server = ThreadingHTTPServer((host, port), DeliveryWebhookHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
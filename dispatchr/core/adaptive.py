@@ -0,0 +1,118 @@
+# core/adaptive.py
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# teto absoluto de envios/s quando o delay mínimo configurado é 0
+MAX_RATE = 5.0
+
+def parse_retry_after(value) -> Optional[float]:
+    """Segundos do cabeçalho Retry-After (None se ausente ou em formato de data)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def is_transport_error(err: Exception) -> bool:
+    """Falha de rede/timeout (sem resposta HTTP), que indica API sobrecarregada."""
+    try:
+        import requests
+    except ImportError:
+        return False
+    return isinstance(err, (requests.ConnectionError, requests.Timeout))
+
+class AdaptiveRate:
+    """
+    Controle AIMD do ritmo de envio, dentro dos limites definidos pelo operador.
+    - Começa no ritmo mais conservador (delay máximo).
+    - Cada envio concluído com sucesso soma um passo fixo à taxa (aumento aditivo).
+    - Cada tentativa HTTP (record_attempt, chamado pelo cliente Chatwoot) alimenta a
+      latência e os sinais de sobrecarga: 429, 5xx, falha de conexão ou p95 acima do
+      alvo / em alta cortam a taxa pela metade (diminuição multiplicativa), mesmo que
+      o retry interno do cliente acabe tendo sucesso.
+    - As esperas do cliente (backoff entre tentativas, pausa após criar contato) não
+      entram na amostra: só o tempo de cada requisição.
+    - 429 com Retry-After também impõe uma espera mínima até o horário indicado.
+    O envio é sequencial, então o controle atua sobre o intervalo entre envios.
+    """
+
+    def __init__(
+        self,
+        min_delay: float = 3.0,
+        max_delay: float = 7.0,
+        target_p95: float = 3.0,
+        rise_factor: float = 1.5,
+        decrease: float = 0.5,
+        steps: int = 20,
+        sample_size: int = 50,
+    ):
+        self.target_p95 = target_p95
+        self.rise_factor = rise_factor
+        self.decrease = decrease
+        self.steps = steps
+        self._lock = threading.Lock()
+        self._lat = deque(maxlen=sample_size)
+        self._ref_p95 = None
+        self._hold = 0
+        self._cooldown_until = 0.0
+        self._lento = False
+        self.set_bounds(min_delay, max_delay)
+        self.rate = self.min_rate
+
+    def set_bounds(self, min_delay: float, max_delay: float) -> None:
+        """Atualiza os limites rígidos (delays em segundos) sem perder o estado."""
+        self.max_rate = min(1.0 / min_delay, MAX_RATE) if min_delay > 0 else MAX_RATE
+        self.min_rate = min(1.0 / max_delay, self.max_rate) if max_delay > 0 else self.max_rate
+        self.step = max((self.max_rate - self.min_rate) / self.steps, 1e-4)
+        if hasattr(self, "rate"):
+            self.rate = min(max(self.rate, self.min_rate), self.max_rate)
+
+    def p95(self) -> Optional[float]:
+        if not self._lat:
+            return None
+        ordenadas = sorted(self._lat)
+        return ordenadas[int(0.95 * (len(ordenadas) - 1))]
+
+    def _backoff(self) -> None:
+        self.rate = max(self.rate * self.decrease, self.min_rate)
+        # segura novas reduções por latência até entrarem amostras pós-ajuste
+        self._hold = max(5, len(self._lat) // 2)
+
+    def record_attempt(self, latency: float, status: Optional[int] = None,
+                       retry_after: Optional[float] = None, transport_error: bool = False) -> None:
+        """
+        Registra uma tentativa HTTP.
+        - status: código HTTP da resposta (None = sem resposta).
+        - transport_error: falha de conexão/timeout.
+        """
+        with self._lock:
+            self._lat.append(latency)
+            p95 = self.p95()
+            self._ref_p95 = p95 if self._ref_p95 is None else 0.95 * self._ref_p95 + 0.05 * p95
+            if self._hold:
+                self._hold -= 1
+            self._lento = len(self._lat) >= 10 and (
+                p95 > self.target_p95 or p95 > self._ref_p95 * self.rise_factor
+            )
+
+            if status == 429:
+                if retry_after:
+                    self._cooldown_until = max(self._cooldown_until, time.time() + retry_after)
+                self._backoff()
+            elif (status is not None and status >= 500) or transport_error:
+                self._backoff()
+            elif self._lento and not self._hold:
+                self._backoff()
+            # demais respostas (2xx, 4xx de validação) não dizem nada sobre a saúde da API
+
+    def record_success(self) -> None:
+        """Envio concluído: aumenta a taxa, a menos que a latência esteja alta."""
+        with self._lock:
+            if not self._lento:
+                self.rate = min(self.rate + self.step, self.max_rate)
+
+    def next_delay(self) -> float:
+        with self._lock:
+            delay = 1.0 / self.rate
+            return max(delay, self._cooldown_until - time.time())
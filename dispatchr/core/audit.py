@@ -0,0 +1,157 @@
+# core/audit.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+# fila limitada: se o disco não acompanhar, eventos são descartados (e contados),
+# nunca bloqueando o envio
+QUEUE_SIZE = 50_000
+FLUSH_INTERVAL = 1.0
+BUFFER_SIZE = 64 * 1024
+_STOP = object()
+
+def _default_dir() -> str:
+    base = os.getenv("DISPATCHR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".dispatchr")
+    return os.getenv("DISPATCHR_AUDIT_DIR") or os.path.join(base, "audit")
+
+class AuditLog:
+    """
+    Log de auditoria em JSON lines (um evento por linha), gravado por uma thread própria.
+    - write() só coloca o evento na fila (put_nowait); serialização e disco ficam na thread.
+    - Grava em buffer e faz flush quando a fila esvazia ou a cada FLUSH_INTERVAL.
+    - Rotação por tamanho: audit.jsonl -> audit.jsonl.1 -> ... -> audit.jsonl.<backups>.
+    - Se o arquivo não puder ser aberto (pasta sem permissão, disco cheio), a thread
+      encerra e o log passa a ignorar novos eventos, sem afetar os envios.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self.dead = False
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._file = None
+        self._size = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, event: str, **fields) -> None:
+        if self.dead:
+            return
+        record = {"ts": time.time(), "event": event}
+        record.update(fields)
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dispatchr-audit", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Grava o que ainda está na fila e encerra a thread (nunca bloqueia além de timeout)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            self.dead = True
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self.dead = True
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8", buffering=BUFFER_SIZE)
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for n in range(self.backups - 1, 0, -1):
+            origem = f"{self.path}.{n}"
+            if os.path.exists(origem):
+                os.replace(origem, f"{self.path}.{n + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _emit(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        tamanho = len(line.encode("utf-8"))
+        if self._size and self._size + tamanho > self.max_bytes:
+            self._rotate()
+        self._file.write(line)
+        self._size += tamanho
+
+    def _run(self) -> None:
+        try:
+            self._open()
+        except OSError:
+            self.dead = True
+            return
+        descartados = 0
+        while True:
+            try:
+                record = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                break
+            try:
+                if record is not None:
+                    self._emit(record)
+                if self.dropped != descartados:
+                    self._emit({"ts": time.time(), "event": "audit_dropped", "count": self.dropped - descartados})
+                    descartados = self.dropped
+                if self._queue.empty():
+                    self._file.flush()
+            except (OSError, ValueError):
+                # ValueError: arquivo fechado por uma rotação que não conseguiu reabrir
+                if self._file.closed:
+                    try:
+                        self._open()
+                    except OSError:
+                        self.dead = True
+                        return
+        self._file.close()
+
+_audit: Optional[AuditLog] = None
+_audit_lock = threading.Lock()
+
+def get_audit() -> Optional[AuditLog]:
+    """
+    Log de auditoria do processo (None se DISPATCHR_AUDIT=0).
+    Pasta: DISPATCHR_AUDIT_DIR (padrão ~/.dispatchr/audit); rotação por
+    DISPATCHR_AUDIT_MAX_MB (padrão 10) e DISPATCHR_AUDIT_BACKUPS (padrão 5).
+    """
+    global _audit
+    if _audit is None:
+        if os.getenv("DISPATCHR_AUDIT", "1") == "0":
+            return None
+        with _audit_lock:
+            if _audit is None:
+                _audit = AuditLog(
+                    os.path.join(_default_dir(), "audit.jsonl"),
+                    max_bytes=int(float(os.getenv("DISPATCHR_AUDIT_MAX_MB", "10")) * 1024 * 1024),
+                    backups=int(os.getenv("DISPATCHR_AUDIT_BACKUPS", "5")),
+                )
+                atexit.register(_audit.close)
+    return _audit
+
+def audit(event: str, **fields) -> None:
+    log = get_audit()
+    if log is not None:
+        log.write(event, **fields)
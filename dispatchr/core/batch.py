@@ -0,0 +1,87 @@
+# core/batch.py
+from typing import Dict, List, Tuple
+
+SEPARADOR = ";"
+# colunas com campo próprio no envio/relatório; as demais só alimentam o template
+BASE_COLUMNS = ("nome", "email", "telefone", "cnpj")
+
+# motivos de descarte de uma linha (mesmo campo "status" das entradas de relatório)
+INVALIDO = "inválido"
+DUPLICADO = "duplicado"
+
+def parse_lote(texto: str) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """
+    Separa o conteúdo colado no campo .txt em cabeçalho e linhas de dados.
+    - Retorna (cabecalho, linhas), onde linhas = [(numero_da_linha, texto), ...].
+    - numero_da_linha segue a numeração do arquivo (cabeçalho = linha 1).
+    - Lança ValueError se não houver cabeçalho e ao menos uma linha.
+    """
+    linhas = (texto or "").strip().split("\n")
+    if len(linhas) < 2:
+        raise ValueError("Arquivo inválido ou vazio.")
+    cabecalho = [h.strip() for h in linhas[0].strip().split(SEPARADOR)]
+    return cabecalho, [(n, linha) for n, linha in enumerate(linhas[1:], start=2)]
+
+def parse_linha(cabecalho: List[str], linha: str) -> Dict[str, str]:
+    """
+    Converte uma linha do lote em dicionário {coluna: valor}.
+    Lança ValueError com o motivo quando a linha deve ser ignorada.
+    """
+    if not linha.strip():
+        raise ValueError("vazia")
+    campos = [c.strip() for c in linha.strip().split(SEPARADOR)]
+    if len(campos) != len(cabecalho):
+        raise ValueError("número de campos incorreto")
+    return dict(zip(cabecalho, campos))
+
+def render(template: str, dados: Dict[str, str]) -> str:
+    return template.format(**dados)
+
+def check_phone(raw: str, region: str = "BR") -> str:
+    """E.164 do telefone; lança ValueError se não for um número válido."""
+    import phonenumbers
+    try:
+        num = phonenumbers.parse(str(raw), region)
+    except phonenumbers.NumberParseException as err:
+        raise ValueError(f"telefone inválido ({err})")
+    if not phonenumbers.is_valid_number(num):
+        raise ValueError("telefone inválido")
+    return phonenumbers.format_number(num, phonenumbers.PhoneNumberFormat.E164)
+
+def validate_rows(cabecalho: List[str], linhas: List[Tuple[int, str]]) -> List[Tuple[int, Dict[str, str], str, str]]:
+    """
+    Valida um bloco de linhas: parse + telefone (E.164).
+    Retorna [(numero_da_linha, dados, telefone_e164, motivo)], motivo "" se válida.
+    Pode rodar em paralelo por blocos; a deduplicação (select_rows) é feita depois, em ordem.
+    """
+    out = []
+    for line_no, linha in linhas:
+        try:
+            dados = parse_linha(cabecalho, linha)
+        except ValueError as err:
+            out.append((line_no, {}, "", str(err)))
+            continue
+        try:
+            out.append((line_no, dados, check_phone(dados.get("telefone", "")), ""))
+        except ValueError as err:
+            out.append((line_no, dados, "", str(err)))
+    return out
+
+def select_rows(validadas) -> Tuple[List[Tuple[int, Dict[str, str], str]], List[Tuple[int, Dict[str, str], str, str]]]:
+    """
+    Etapa final do pipeline do lote, usada pelo disparo e pela pré-visualização:
+    descarta linhas inválidas e telefones repetidos (fica a primeira ocorrência).
+    Retorna (aceitas, descartadas):
+    - aceitas: [(numero_da_linha, dados, telefone_e164)]
+    - descartadas: [(numero_da_linha, dados, status, motivo)], status INVALIDO ou DUPLICADO
+    """
+    aceitas, descartadas, vistos = [], [], set()
+    for line_no, dados, phone, motivo in validadas:
+        if motivo:
+            descartadas.append((line_no, dados, INVALIDO, motivo))
+        elif phone in vistos:
+            descartadas.append((line_no, dados, DUPLICADO, "telefone repetido no lote"))
+        else:
+            vistos.add(phone)
+            aceitas.append((line_no, dados, phone))
+    return aceitas, descartadas
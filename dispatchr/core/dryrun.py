@@ -0,0 +1,113 @@
+# core/dryrun.py
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.batch import DUPLICADO, INVALIDO, parse_lote, render, select_rows, validate_rows
+
+# status das linhas na pré-visualização (mesmo campo "status" das entradas reais)
+SIMULADO = "simulado"
+
+# abaixo disso o custo de subir processos não compensa
+PARALLEL_MIN_ROWS = 20_000
+CHUNK_SIZE = 5_000
+
+@dataclass
+class PreviewRow:
+    line_no: int
+    dados: Dict[str, str]
+    phone: str = ""
+    message: str = ""
+    status: str = SIMULADO
+    reason: str = ""
+
+@dataclass
+class PreviewResult:
+    rows: List[PreviewRow] = field(default_factory=list)
+    to_send: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    estimated_seconds: Tuple[float, float] = (0.0, 0.0)
+    existing_contacts: Optional[int] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.rows)
+
+def _count_existing(phones: List[str], workers: int = 4) -> int:
+    """Consulta (somente leitura) quantos telefones já existem como contato no Chatwoot."""
+    from chatwoot_config.chatwoot_client import search_contacts
+    from concurrent.futures import ThreadPoolExecutor
+
+    def existe(phone):
+        try:
+            return bool(search_contacts(phone))
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(existe, phones))
+
+def preview_batch(
+    texto: str,
+    template: str,
+    delays: Tuple[float, float],
+    per_send: float = 1.0,
+    resolve_contacts: bool = False,
+    processes: Optional[int] = None,
+    lookup=None,
+) -> PreviewResult:
+    """
+    Executa o pipeline do disparo em lote sem enviar nada, com as mesmas etapas
+    do disparo real (core.batch.validate_rows/select_rows):
+    parse -> validação do telefone (E.164) -> deduplicação -> renderização
+    -> (opcional) consulta de contatos existentes.
+    - delays: (mínimo, máximo) em segundos entre envios, para a estimativa de duração.
+    - per_send: tempo médio estimado de cada envio na API.
+    - Lotes grandes são validados em blocos, em paralelo (processos).
+    - lookup: LookupTable opcional para enriquecer as linhas na renderização.
+    Lança ValueError se o conteúdo não tiver cabeçalho e dados.
+    """
+    cabecalho, linhas = parse_lote(texto)
+
+    blocos = [linhas[i:i + CHUNK_SIZE] for i in range(0, len(linhas), CHUNK_SIZE)]
+    if len(linhas) >= PARALLEL_MIN_ROWS and len(blocos) > 1:
+        # multiprocessing só é carregado quando o lote é grande o bastante para usar processos
+        from concurrent.futures import ProcessPoolExecutor
+        workers = processes or min(len(blocos), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partes = list(pool.map(validate_rows, [cabecalho] * len(blocos), blocos))
+    else:
+        partes = [validate_rows(cabecalho, b) for b in blocos]
+
+    aceitas, descartadas = select_rows(v for parte in partes for v in parte)
+
+    result = PreviewResult()
+    for line_no, dados, status, motivo in descartadas:
+        result.rows.append(PreviewRow(line_no, dados, status=status, reason=motivo))
+        if status == DUPLICADO:
+            result.duplicates += 1
+        else:
+            result.invalid += 1
+    for line_no, dados, phone in aceitas:
+        row = PreviewRow(line_no, dados, phone=phone)
+        try:
+            row.message = render(template, lookup.enrich(dados) if lookup is not None else dados)
+            result.to_send += 1
+        except Exception as err:
+            # no disparo real a linha também seria pulada ao formatar a mensagem
+            row.status, row.reason = INVALIDO, f"erro no template: {err!r}"
+            result.invalid += 1
+        result.rows.append(row)
+    result.rows.sort(key=lambda r: r.line_no)
+
+    mn, mx = delays
+    result.estimated_seconds = (result.to_send * (mn + per_send), result.to_send * (mx + per_send))
+    if resolve_contacts:
+        result.existing_contacts = _count_existing([r.phone for r in result.rows if r.status == SIMULADO])
+    return result
+
+def format_duration(seconds: float) -> str:
+    h, rest = divmod(int(seconds), 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
@@ -0,0 +1,86 @@
+# core/entries.py
+import sys
+import time
+from collections import deque
+from typing import Dict
+
+RECENT_LOGS_LIMIT = 200
+REPORTS_LIMIT = 500
+
+# último carimbo gerado: envios no mesmo segundo reaproveitam a mesma string
+_last_stamp = (0, "")
+
+def stamp(now: float = None) -> str:
+    global _last_stamp
+    sec = int(time.time() if now is None else now)
+    last = _last_stamp
+    if last[0] != sec:
+        last = (sec, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec)))
+        _last_stamp = last
+    return last[1]
+
+class RunEntry:
+    """
+    Linha de log/relatório de um envio.
+    - __slots__ evita um dict por entrada; status e horário são strings internadas.
+    - A mesma instância é compartilhada por recent_logs, pela campanha e pelo relatório.
+    - get()/[] mantêm a leitura compatível com os relatórios antigos (dicts).
+    - message_id/delivery: ID da mensagem no Chatwoot e status de entrega vindo do webhook.
+    - extra: colunas do lote além de nome/email/telefone/cnpj (None se não houver),
+      para que a linha possa ser reenviada com o mesmo template.
+    """
+    __slots__ = ("to", "email", "phone", "cnpj", "status", "time", "message_id", "delivery", "extra")
+
+    def __init__(self, to: str = "", email: str = "", phone: str = "", cnpj: str = "",
+                 status: str = "", time: str = "", message_id=None, delivery: str = "", extra=None):
+        self.to = to or ""
+        self.email = email or ""
+        self.phone = phone or ""
+        self.cnpj = cnpj or ""
+        self.status = sys.intern(status or "")
+        self.time = sys.intern(time or stamp())
+        self.message_id = message_id
+        self.delivery = sys.intern(delivery or "")
+        self.extra = extra or None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def row(self) -> Dict[str, str]:
+        """Dados da linha no formato do lote (cabeçalho nome;email;telefone;cnpj + extras)."""
+        dados = {"nome": self.to, "email": self.email, "telefone": self.phone, "cnpj": self.cnpj}
+        if self.extra:
+            dados.update(self.extra)
+        return dados
+
+    def to_dict(self) -> Dict[str, str]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "RunEntry":
+        return cls(**{k: data.get(k) for k in cls.__slots__})
+
+def recent_logs() -> deque:
+    """Buffer circular dos logs recentes (mais recente primeiro, via appendleft)."""
+    return deque(maxlen=RECENT_LOGS_LIMIT)
+
+def report_to_dict(report: dict) -> dict:
+    """
+    Cópia serializável (JSON) de um relatório para o client_storage.
+    Os contadores de entrega são copiados: o webhook pode alterá-los enquanto a cópia é codificada.
+    """
+    data = dict(report)
+    if isinstance(data.get("delivery"), dict):
+        data["delivery"] = dict(data["delivery"])
+    data["entries"] = [e.to_dict() if isinstance(e, RunEntry) else e for e in report.get("entries", [])]
+    return data
+
+def report_from_dict(data: dict) -> dict:
+    report = dict(data)
+    report["entries"] = [e if isinstance(e, RunEntry) else RunEntry.from_dict(e) for e in data.get("entries", [])]
+    return report
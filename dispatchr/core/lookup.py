@@ -0,0 +1,192 @@
+# core/lookup.py
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from core.report_store import phone_key
+
+# colunas aceitas como chave em cada tipo de junção
+KEY_COLUMNS = {
+    "cnpj": ("cnpj",),
+    "telefone": ("telefone", "phone", "phone_number", "celular", "whatsapp"),
+}
+# leitura via mmap do SQLite (bytes); o SO carrega só as páginas consultadas
+MMAP_SIZE = 1 << 30
+IMPORT_BATCH = 10_000
+
+def normalize_key(kind: str, value: str) -> str:
+    if kind == "telefone":
+        return phone_key(value)
+    return re.sub(r"\D", "", value or "")
+
+def _index_path(source: str, kind: str) -> str:
+    base = os.getenv("DISPATCHR_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".dispatchr")
+    tag = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(base, f"lookup_{tag}_{kind}.sqlite")
+
+def _find_key(columns, kind: str) -> Optional[str]:
+    nomes = {c.lower().strip(): c for c in columns}
+    for candidato in KEY_COLUMNS[kind]:
+        if candidato in nomes:
+            return nomes[candidato]
+    return None
+
+class _PontoEVirgula(csv.excel):
+    delimiter = ";"
+
+def _iter_csv(path: str, kind: str):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(amostra, delimiters=";,\t|")
+        except csv.Error:
+            dialect = _PontoEVirgula
+        reader = csv.DictReader(f, dialect=dialect)
+        key = _find_key(reader.fieldnames or [], kind)
+        if key is None:
+            raise ValueError(f"Coluna de {kind} não encontrada em {os.path.basename(path)}")
+        for row in reader:
+            yield row.get(key, ""), {k.strip(): (v or "").strip() for k, v in row.items() if k}
+
+def _iter_sqlite(path: str, kind: str, table: Optional[str]):
+    src = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tabelas = [r[0] for r in src.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for nome in ([table] if table else tabelas):
+            cols = [r[1] for r in src.execute(f'PRAGMA table_info("{nome}")')]
+            key = _find_key(cols, kind)
+            if key is not None:
+                break
+        else:
+            raise ValueError(f"Nenhuma tabela com coluna de {kind} em {os.path.basename(path)}")
+        cur = src.execute(f'SELECT * FROM "{nome}"')
+        for row in cur:
+            dados = {c: "" if v is None else str(v) for c, v in zip(cols, row)}
+            yield dados[key], dados
+    finally:
+        src.close()
+
+class LookupTable:
+    """
+    Tabela de referência local (CSV ou export SQLite) para enriquecer as linhas do lote.
+    - Na primeira vez, importa a origem (em streaming) para um índice SQLite em cache,
+      com chave normalizada (CNPJ ou telefone); reimporta se a origem mudar.
+    - Consultas leem o índice via mmap: nada da tabela é carregado em memória por execução.
+    - Pode ser enviada a outros processos; a conexão é reaberta lá.
+    """
+
+    def __init__(self, source: str, kind: str = "cnpj", table: Optional[str] = None):
+        if kind not in KEY_COLUMNS:
+            raise ValueError(f"Chave de junção inválida: {kind}")
+        self.source = os.path.abspath(source)
+        self.kind = kind
+        self.table = table
+        self.index_path = _index_path(self.source, kind)
+        self._local = threading.local()
+        try:
+            self._ensure_index()
+        except (sqlite3.Error, csv.Error) as err:
+            raise ValueError(f"não foi possível indexar {os.path.basename(self.source)}: {err}")
+
+    def __getstate__(self):
+        return {"source": self.source, "kind": self.kind, "table": self.table, "index_path": self.index_path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _signature(self) -> str:
+        st = os.stat(self.source)
+        return f"{st.st_mtime_ns}:{st.st_size}:{self.table or ''}"
+
+    def _ensure_index(self) -> None:
+        assinatura = self._signature()
+        if os.path.exists(self.index_path):
+            try:
+                db = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+                try:
+                    atual = db.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+                finally:
+                    # conexão aberta impede o os.replace do novo índice no Windows
+                    db.close()
+                if atual and atual[0] == assinatura:
+                    return
+            except sqlite3.Error:
+                pass
+        self._build_index(assinatura)
+
+    def _build_index(self, assinatura: str) -> None:
+        pasta = os.path.dirname(self.index_path)
+        os.makedirs(pasta, exist_ok=True)
+        if self.source.lower().endswith((".sqlite", ".sqlite3", ".db")):
+            linhas = _iter_sqlite(self.source, self.kind, self.table)
+        else:
+            linhas = _iter_csv(self.source, self.kind)
+
+        # nome único na mesma pasta: processos indexando a mesma origem não se atropelam
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.index_path) + ".", suffix=".tmp", dir=pasta)
+        os.close(fd)
+        try:
+            self._write_index(tmp, linhas, assinatura)
+            os.replace(tmp, self.index_path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_index(self, tmp: str, linhas, assinatura: str) -> None:
+        db = sqlite3.connect(tmp)
+        try:
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            db.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE lookup (k TEXT PRIMARY KEY, row TEXT) WITHOUT ROWID")
+            lote = []
+            for valor, dados in linhas:
+                k = normalize_key(self.kind, valor)
+                if k:
+                    lote.append((k, json.dumps(dados, ensure_ascii=False)))
+                if len(lote) >= IMPORT_BATCH:
+                    db.executemany("INSERT OR REPLACE INTO lookup VALUES (?, ?)", lote)
+                    lote = []
+            db.executemany("INSERT OR REPLACE INTO lookup VALUES (?, ?)", lote)
+            db.execute("INSERT INTO meta VALUES ('signature', ?)", (assinatura,))
+            db.commit()
+        finally:
+            db.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, value: str) -> Optional[Dict[str, str]]:
+        k = normalize_key(self.kind, value)
+        if not k:
+            return None
+        row = self._conn().execute("SELECT row FROM lookup WHERE k = ?", (k,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def enrich(self, dados: Dict[str, str]) -> Dict[str, str]:
+        """
+        Dados da linha + colunas da tabela de referência.
+        Colunas coladas no lote têm prioridade sobre as da tabela.
+        """
+        extra = self.get(dados.get(self.kind, ""))
+        if not extra:
+            return dados
+        merged = dict(extra)
+        merged.update(dados)
+        return merged
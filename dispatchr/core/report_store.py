@@ -0,0 +1,158 @@
+# core/report_store.py
+import itertools
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.entries import REPORTS_LIMIT, report_from_dict
+
+SUCESSO = "sucesso"
+FALHA = "falha"
+# status de entrega (webhook) que também conta como falha para reenvio
+ENTREGA_FALHOU = "falhou"
+
+def phone_key(phone: str) -> str:
+    """Chave do telefone para comparar execuções: só dígitos, sem o DDI 55."""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("55") and len(digits) >= 12:
+        digits = digits[2:]
+    return digits
+
+def _failed(entry) -> bool:
+    return entry.get("status") == FALHA or entry.get("delivery") == ENTREGA_FALHOU
+
+class ReportStore:
+    """
+    Relatórios de execução (mais recente primeiro, limitado a REPORTS_LIMIT) com índices:
+    - por id do relatório;
+    - entradas com falha de cada relatório (reenvio sem varrer as entradas);
+    - último resultado por telefone entre todos os relatórios (para pular quem já
+      recebeu com sucesso depois da falha).
+    Mantém a interface de sequência usada pela página de relatórios (len, [i], iteração).
+    """
+
+    def __init__(self, reports: Iterable[dict] = (), limit: int = REPORTS_LIMIT):
+        self._reports = deque(maxlen=limit)
+        self._by_id: Dict[int, dict] = {}
+        self._failed: Dict[int, List] = {}
+        # telefone -> (ts, status, id do relatório)
+        self._last: Dict[str, Tuple[float, str, int]] = {}
+        itens = list(reports)
+        ids = [r["id"] for r in itens if isinstance(r.get("id"), int)]
+        self._ids = itertools.count(max(ids, default=0) + 1)
+        # adiciona do mais antigo para o mais novo, preservando a ordem original
+        for report in reversed(itens):
+            self.appendleft(report)
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+    def __getitem__(self, idx: int) -> dict:
+        return self._reports[idx]
+
+    def __iter__(self):
+        return iter(self._reports)
+
+    def get(self, report_id: int) -> Optional[dict]:
+        return self._by_id.get(report_id)
+
+    def appendleft(self, report: dict) -> dict:
+        """Adiciona um relatório (o mais antigo sai quando o limite é atingido)."""
+        if not isinstance(report.get("id"), int):
+            report["id"] = next(self._ids)
+        if len(self._reports) == self._reports.maxlen:
+            self._evict(self._reports[-1])
+        self._reports.appendleft(report)
+        self._by_id[report["id"]] = report
+        self._failed[report["id"]] = [e for e in report.get("entries", []) if _failed(e)]
+        ts = report.get("ts", 0)
+        for entry in report.get("entries", []):
+            key = phone_key(entry.get("phone", ""))
+            if key and ts >= self._last.get(key, (0,))[0]:
+                self._last[key] = (ts, entry.get("status", ""), report["id"])
+        return report
+
+    def _evict(self, report: dict) -> None:
+        self._by_id.pop(report.get("id"), None)
+        self._failed.pop(report.get("id"), None)
+        for entry in report.get("entries", []):
+            key = phone_key(entry.get("phone", ""))
+            if self._last.get(key, (0, "", None))[2] == report.get("id"):
+                del self._last[key]
+
+    def note_delivery_failure(self, entry, report: dict) -> None:
+        """Entrada que falhou na entrega (webhook) passa a ser candidata a reenvio."""
+        falhas = self._failed.get(report.get("id"))
+        if falhas is not None and entry not in falhas:
+            falhas.append(entry)
+
+    def pending_failures(self, report_id: int) -> List:
+        """
+        Falhas do relatório que ainda não tiveram sucesso em execução posterior.
+        Usa só os índices: custo proporcional ao número de falhas, não ao relatório.
+        """
+        report = self._by_id.get(report_id)
+        if report is None:
+            return []
+        ts = report.get("ts", 0)
+        pendentes, vistos = [], set()
+        for entry in self._failed.get(report_id, []):
+            key = phone_key(entry.get("phone", ""))
+            if key in vistos:
+                continue
+            vistos.add(key)
+            last = self._last.get(key)
+            if last and last[1] == SUCESSO and last[0] > ts and entry.get("delivery") != ENTREGA_FALHOU:
+                continue
+            pendentes.append(entry)
+        return pendentes
+
+    def previous(self, report: dict) -> Optional[dict]:
+        """Relatório de origem (reenvio) ou, na falta dele, o relatório imediatamente anterior."""
+        parent = self._by_id.get(report.get("parent_id"))
+        if parent is not None:
+            return parent
+        encontrado = False
+        for r in self._reports:
+            if encontrado:
+                return r
+            if r is report:
+                encontrado = True
+        return None
+
+    @classmethod
+    def from_list(cls, data: Iterable[dict]) -> "ReportStore":
+        return cls(report_from_dict(r) for r in data)
+
+def diff_reports(old: dict, new: dict) -> Dict[str, List[str]]:
+    """
+    Compara duas execuções por telefone.
+    - corrigidos: falha em old, sucesso em new
+    - persistentes: falha nas duas
+    - novas_falhas: sucesso (ou ausente) em old, falha em new
+    - so_no_anterior / so_no_novo: telefones presentes em apenas uma delas
+    """
+    def status_map(report):
+        out = {}
+        for e in report.get("entries", []):
+            key = phone_key(e.get("phone", ""))
+            if key:
+                out[key] = FALHA if _failed(e) else e.get("status", "")
+        return out
+
+    a, b = status_map(old), status_map(new)
+    diff = {"corrigidos": [], "persistentes": [], "novas_falhas": [], "so_no_anterior": [], "so_no_novo": []}
+    for key, st in b.items():
+        antes = a.get(key)
+        if antes is None:
+            diff["so_no_novo"].append(key)
+            if st == FALHA:
+                diff["novas_falhas"].append(key)
+        elif antes == FALHA and st == SUCESSO:
+            diff["corrigidos"].append(key)
+        elif antes == FALHA and st == FALHA:
+            diff["persistentes"].append(key)
+        elif antes != FALHA and st == FALHA:
+            diff["novas_falhas"].append(key)
+    diff["so_no_anterior"] = [k for k in a if k not in b]
+    return diff
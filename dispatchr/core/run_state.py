@@ -0,0 +1,134 @@
+# core/run_state.py
+import threading
+from typing import NamedTuple, Optional
+
+from core.entries import recent_logs, report_to_dict
+from core.report_store import ReportStore
+
+class RunSnapshot(NamedTuple):
+    """Leitura consistente do estado para a UI (sem segurar lock durante o desenho)."""
+    total_sent: int
+    successes: int
+    failures: int
+    is_running: bool
+    is_paused: bool
+
+class RunState:
+    """
+    Estado compartilhado entre a UI e as threads de envio.
+    - Contadores globais e da execução (campanha) são atualizados juntos, sob um
+      único lock de curta duração, em record().
+    - Cada execução tem seus próprios contadores (successes/failures da campanha),
+      então um envio individual durante um lote não altera o total do lote.
+    - Pausa é um threading.Event: as threads de envio leem sem lock.
+    - reports/recent_logs só devem ser alterados pelos métodos desta classe.
+    - Pré-visualizações (dry_run) ficam fora do ReportStore, em um slot próprio com
+      só a mais recente: não ocupam vagas nem expulsam relatórios reais.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paused = threading.Event()
+        self._running = threading.Event()
+        self.total_sent = 0
+        self.successes = 0
+        self.failures = 0
+        self.recent_logs = recent_logs()
+        self.reports = ReportStore()
+        self.preview: Optional[dict] = None
+
+    @property
+    def is_paused(self) -> bool:
+        return self._paused.is_set()
+
+    @is_paused.setter
+    def is_paused(self, value: bool) -> None:
+        if value:
+            self._paused.set()
+        else:
+            self._paused.clear()
+
+    @property
+    def is_running(self) -> bool:
+        return self._running.is_set()
+
+    @is_running.setter
+    def is_running(self, value: bool) -> None:
+        if value:
+            self._running.set()
+        else:
+            self._running.clear()
+
+    def record(self, entry, ok: bool, run: Optional[object] = None) -> None:
+        """
+        Registra o resultado de um envio.
+        - run: objeto com contadores successes/failures da execução (ex.: Campaign).
+        """
+        with self._lock:
+            self.total_sent += 1
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+            if run is not None:
+                if ok:
+                    run.successes += 1
+                else:
+                    run.failures += 1
+            self.recent_logs.appendleft(entry)
+
+    def add_report(self, report: dict) -> dict:
+        with self._lock:
+            if report.get("dry_run"):
+                self.preview = report
+                return report
+            return self.reports.appendleft(report)
+
+    def replace_reports(self, store: ReportStore) -> None:
+        with self._lock:
+            self.reports = store
+
+    def report_list(self) -> list:
+        """
+        Cópia da lista de relatórios (mais recente primeiro) para a UI iterar com segurança.
+        A última pré-visualização, se houver, aparece na posição cronológica.
+        """
+        with self._lock:
+            reports = list(self.reports)
+            preview = self.preview
+        if preview is not None:
+            pos = next((i for i, r in enumerate(reports) if r.get("ts", 0) <= preview.get("ts", 0)), len(reports))
+            reports.insert(pos, preview)
+        return reports
+
+    def pending_failures(self, report_id: int) -> list:
+        with self._lock:
+            return self.reports.pending_failures(report_id)
+
+    def previous_report(self, report: dict) -> Optional[dict]:
+        with self._lock:
+            return self.reports.previous(report)
+
+    def persistable_reports(self) -> list:
+        """
+        Relatórios serializáveis para persistência.
+        Só a cópia da lista é feita sob o lock; a serialização (que pode cobrir
+        centenas de relatórios) roda fora dele, sem travar record() nos envios.
+        """
+        with self._lock:
+            reports = list(self.reports)
+        return [report_to_dict(r) for r in reports]
+
+    def note_delivery_failure(self, entry, report: dict) -> None:
+        with self._lock:
+            self.reports.note_delivery_failure(entry, report)
+
+    def snapshot(self) -> RunSnapshot:
+        with self._lock:
+            return RunSnapshot(
+                self.total_sent,
+                self.successes,
+                self.failures,
+                self.is_running,
+                self.is_paused,
+            )
@@ -0,0 +1,288 @@
+# core/scheduler.py
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from datetime import time as dtime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# fuso usado quando a campanha não informa um e o destinatário não tem fuso conhecido
+DEFAULT_TZ = "America/Sao_Paulo"
+
+_ids = itertools.count(1)
+
+def _zone(tz: Optional[str]):
+    """
+    ZoneInfo do fuso (padrão DEFAULT_TZ).
+    Lança ValueError se o fuso for inválido ou se não houver base de fusos
+    (no Windows ela vem do pacote tzdata, listado no requirements.txt).
+    """
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    nome = tz or DEFAULT_TZ
+    try:
+        return ZoneInfo(nome)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Fuso horário inválido ou indisponível: {nome!r} (verifique o nome ou instale o pacote tzdata)")
+
+def parse_hhmm(valor: str) -> dtime:
+    h, m = valor.strip().split(":")
+    return dtime(int(h), int(m))
+
+@dataclass
+class SendWindow:
+    """
+    Janela de envio permitida (ex.: 08:00-18:00), avaliada no fuso informado.
+    - end < start representa janela que atravessa a meia-noite.
+    - weekdays: dias permitidos (0 = segunda); None = todos os dias.
+    """
+    start: dtime
+    end: dtime
+    weekdays: Optional[frozenset] = None
+
+    @classmethod
+    def parse(cls, texto: str, business_days: bool = False) -> "SendWindow":
+        """Aceita 'HH:MM-HH:MM'. Lança ValueError se o formato for inválido ou a janela for vazia."""
+        try:
+            ini, fim = texto.split("-")
+            window = cls(parse_hhmm(ini), parse_hhmm(fim))
+        except Exception:
+            raise ValueError(f"Janela inválida: {texto!r} (use HH:MM-HH:MM)")
+        if window.start == window.end:
+            raise ValueError(f"Janela vazia: {texto!r} (início e fim iguais)")
+        if business_days:
+            window.weekdays = frozenset(range(5))
+        return window
+
+    def _day_ok(self, dt: datetime) -> bool:
+        return self.weekdays is None or dt.weekday() in self.weekdays
+
+    def is_open(self, now: float, tz: Optional[str] = None) -> bool:
+        dt = datetime.fromtimestamp(now, _zone(tz))
+        t = dt.time()
+        if self.start <= self.end:
+            return self._day_ok(dt) and self.start <= t < self.end
+        # janela noturna: a parte após a meia-noite pertence ao dia anterior
+        if t >= self.start:
+            return self._day_ok(dt)
+        if t < self.end:
+            return self._day_ok(dt - timedelta(days=1))
+        return False
+
+    def next_open(self, now: float, tz: Optional[str] = None) -> float:
+        """Timestamp da próxima abertura da janela (now se já estiver aberta)."""
+        if self.is_open(now, tz):
+            return now
+        zone = _zone(tz)
+        base = datetime.fromtimestamp(now, zone)
+        for d in range(8):
+            dia = base.date() + timedelta(days=d)
+            candidato = datetime.combine(dia, self.start, tzinfo=zone)
+            if candidato.timestamp() > now and self._day_ok(candidato):
+                return candidato.timestamp()
+        return now + 24 * 3600
+
+@dataclass
+class Campaign:
+    """
+    Campanha agendada: linhas já validadas + template + regras de início/janela.
+    - rows: [(numero_da_linha, dados), ...]
+    - tz: fuso da janela; "auto" usa o fuso do telefone de cada destinatário.
+    - priority: peso no rodízio entre campanhas ativas (maior = mais envios).
+    - inbox_id: caixa de entrada usada nos envios (None = padrão do .env).
+    - attachment: anexo enviado a todos os destinatários (carregado uma vez).
+    - parent_id: relatório de origem quando a campanha é um reenvio de falhas.
+    - lookup: tabela de referência (LookupTable) que enriquece cada linha na renderização.
+    """
+    name: str
+    rows: List[Tuple[int, Dict[str, str]]]
+    template: str
+    start_at: float = 0.0
+    window: Optional[SendWindow] = None
+    tz: Optional[str] = None
+    priority: int = 1
+    inbox_id: Optional[str] = None
+    attachment: Optional[object] = None
+    parent_id: Optional[int] = None
+    lookup: Optional[object] = None
+    id: int = field(default_factory=lambda: next(_ids))
+    entries: list = field(default_factory=list)
+    size: int = 0
+    successes: int = 0
+    failures: int = 0
+    skipped: int = 0
+    # estado interno do rodízio
+    _groups: "OrderedDict[str, deque]" = field(default_factory=OrderedDict, repr=False)
+    _weight: int = field(default=0, repr=False)
+
+    def prepare(self, tz_for_row: Optional[Callable[[Dict[str, str]], Optional[str]]] = None):
+        """
+        Agrupa as linhas por fuso, para que cada grupo siga sua própria janela.
+        Com janela definida, lança ValueError se algum fuso não puder ser carregado.
+        """
+        self._groups.clear()
+        self.size = len(self.rows)
+        for line_no, dados in self.rows:
+            tz = self.tz
+            if tz == "auto":
+                tz = (tz_for_row(dados) if tz_for_row else None) or DEFAULT_TZ
+            self._groups.setdefault(tz or DEFAULT_TZ, deque()).append((line_no, dados))
+        if self.window is not None:
+            for tz in self._groups:
+                _zone(tz)
+        self.rows = []
+
+    @property
+    def processed(self) -> int:
+        return self.successes + self.failures + self.skipped
+
+    @property
+    def done(self) -> bool:
+        return not any(self._groups.values())
+
+    def open_group(self, now: float) -> Optional[str]:
+        """Primeiro grupo com linhas pendentes cuja janela está aberta."""
+        if now < self.start_at:
+            return None
+        for tz, fila in self._groups.items():
+            if fila and (self.window is None or self.window.is_open(now, tz)):
+                return tz
+        return None
+
+    def next_eligible(self, now: float) -> float:
+        start = max(now, self.start_at)
+        if self.window is None:
+            return start
+        return min((self.window.next_open(start, tz) for tz, fila in self._groups.items() if fila), default=start)
+
+    def pop(self, tz: str) -> Tuple[int, Dict[str, str]]:
+        item = self._groups[tz].popleft()
+        # rodízio entre fusos: o grupo atendido vai para o fim
+        self._groups.move_to_end(tz)
+        return item
+
+class CampaignScheduler:
+    """
+    Fila de campanhas com uma única thread de envio.
+    - Respeita início agendado e janelas de envio de cada campanha.
+    - Intercala campanhas ativas por rodízio ponderado pela prioridade
+      (smooth weighted round-robin), sem esperar uma lista terminar.
+    - O intervalo entre envios é global: o orçamento de envio é dividido entre
+      as campanhas ativas, em vez de somado por campanha.
+
+    process_row(campaign, line_no, dados) -> bool: executa a linha e retorna True se
+    houve tentativa de envio (só então o intervalo é aplicado).
+    """
+
+    def __init__(
+        self,
+        process_row: Callable[[Campaign, int, Dict[str, str]], bool],
+        get_delays: Callable[[], Tuple[float, float]],
+        is_paused: Callable[[], bool] = lambda: False,
+        on_finish: Callable[[Campaign], None] = lambda c: None,
+        on_status: Callable[[str], None] = lambda s: None,
+        slice_dt: float = 0.2,
+    ):
+        self._process_row = process_row
+        self._get_delays = get_delays
+        self._is_paused = is_paused
+        self._on_finish = on_finish
+        self._on_status = on_status
+        self._slice_dt = slice_dt
+        self._campaigns: List[Campaign] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._next_send_at = 0.0
+
+    def submit(self, campaign: Campaign) -> None:
+        """
+        Coloca a campanha na fila (prepare() é chamado se ainda não foi).
+        Campanha sem linhas é finalizada na hora: nunca seria escolhida pelo rodízio.
+        """
+        if campaign.rows:
+            campaign.prepare()
+        if campaign.done:
+            self._on_finish(campaign)
+            return
+        with self._cond:
+            self._campaigns.append(campaign)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def pending(self) -> List[Campaign]:
+        with self._cond:
+            return list(self._campaigns)
+
+    def _pick(self, now: float) -> Tuple[Optional[Campaign], Optional[str]]:
+        with self._cond:
+            elegiveis = []
+            for c in self._campaigns:
+                tz = c.open_group(now)
+                if tz is not None:
+                    elegiveis.append((c, tz))
+            if not elegiveis:
+                return None, None
+            total = 0
+            escolhida = None
+            for c, tz in elegiveis:
+                c._weight += max(1, c.priority)
+                total += max(1, c.priority)
+                if escolhida is None or c._weight > escolhida[0]._weight:
+                    escolhida = (c, tz)
+            escolhida[0]._weight -= total
+            return escolhida
+
+    def _wait(self, seconds: float) -> None:
+        with self._cond:
+            self._cond.wait(timeout=max(seconds, 0.0))
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if not self._campaigns:
+                    self._thread = None
+                    return
+
+            if self._is_paused():
+                self._on_status("⏸️ Pausado. Aguardando continuar...")
+                while self._is_paused():
+                    time.sleep(self._slice_dt)
+                continue
+
+            now = time.time()
+            # intervalo global entre envios, em fatias curtas para a pausa reagir rápido
+            if now < self._next_send_at:
+                time.sleep(min(self._slice_dt, self._next_send_at - now))
+                continue
+
+            campaign, tz = self._pick(now)
+            if campaign is None:
+                with self._cond:
+                    proxima = min(c.next_eligible(now) for c in self._campaigns)
+                self._on_status(
+                    f"🕒 Aguardando janela de envio. Próximo envio: "
+                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(proxima))}"
+                )
+                self._wait(min(proxima - now, 1.0))
+                continue
+
+            line_no, dados = campaign.pop(tz)
+            sent = False
+            try:
+                sent = self._process_row(campaign, line_no, dados)
+            except Exception as err:
+                # uma linha com erro inesperado não pode derrubar a fila inteira
+                campaign.skipped += 1
+                self._on_status(f"❌ Erro inesperado na linha {line_no}: {err}")
+            finally:
+                if sent:
+                    mn, mx = self._get_delays()
+                    self._next_send_at = time.time() + random.uniform(mn, mx)
+                if campaign.done:
+                    with self._cond:
+                        self._campaigns.remove(campaign)
+                    self._on_finish(campaign)
@@ -1,36 +1,47 @@
 # pages/reports.py
 import flet as ft
-import csv
-import io
 import time
 import os
-import platform
-import subprocess
 from typing import List, Dict
 
+from core.report_store import diff_reports
+from core.run_state import RunState
+
 def _format_datetime(ts: float) -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
 
 def _reports_summary(reports: List[Dict]) -> ft.Column:
     total_reports = len(reports)
+    # pré-visualizações (dry-run) não enviaram nada: ficam fora dos totais
+    reports = [r for r in reports if not r.get("dry_run")]
     total_sent = sum(r.get("total", 0) for r in reports)
     total_success = sum(r.get("successes", 0) for r in reports)
     total_fail = sum(r.get("failures", 0) for r in reports)
+    delivered = sum(r.get("delivery", {}).get("entregue", 0) for r in reports)
+    read = sum(r.get("delivery", {}).get("lida", 0) for r in reports)
+    undelivered = sum(r.get("delivery", {}).get("falhou", 0) for r in reports)
     return ft.Column([
         ft.Text("Relatórios", size=24, weight="bold"),
         ft.Text(f"Relatórios gerados: {total_reports}"),
         ft.Text(f"Total mensagens: {total_sent}  |  Sucessos: {total_success}  |  Falhas: {total_fail}"),
+        ft.Text(f"Entregues: {delivered}  |  Lidas: {read}  |  Falhas de entrega: {undelivered}"),
     ], spacing=6)
 
-def build_reports(state: dict, page):
+def build_reports(state: RunState, page, on_rerun=None):
     """
     Constrói a interface da aba Relatórios.
-    - state: dicionário compartilhado do app (state['reports'] = list)
+    - state: RunState do app (relatórios em state.reports, um ReportStore)
     - page: objeto Page do Flet
+    - on_rerun: callback(report) -> (mensagem, enfileirado) que agenda o reenvio das falhas do relatório
+    O Container retornado traz em .data uma função refresh_delivery() que atualiza só
+    os números/status de entrega (resumo, tabela e detalhe aberto), sem reconstruir a tela.
     """
-    reports = state.setdefault("reports", [])  # lista de relatórios
+    reports = state.report_list()  # cópia: o worker pode adicionar relatórios enquanto a tela é montada
 
     selected_report_detail = ft.Column([ft.Text("Selecione um relatório para ver detalhes.")], spacing=6, expand=True)
+    # textos de entrega atualizados por refresh_delivery(): (relatório, entregues, lidas) e (entrada, texto)
+    delivery_cells = []
+    detail_delivery = []
 
     def _show_report_detail(original_idx: int, display_id: int):
         # valida índice original
@@ -52,13 +63,17 @@ def build_reports(state: dict, page):
 
         # construir linhas de detalhe
         detail_rows = []
+        detail_delivery.clear()
         for entry in r.get("entries", []):
+            entrega_text = ft.Text(entry.get("delivery", "") or "-")
+            detail_delivery.append((entry, entrega_text))
             detail_rows.append(ft.DataRow(cells=[
                 ft.DataCell(ft.Text(entry.get("to", ""))),
                 ft.DataCell(ft.Text(entry.get("email", ""))),
                 ft.DataCell(ft.Text(entry.get("phone", ""))),
                 ft.DataCell(ft.Text(entry.get("cnpj", ""))),
                 ft.DataCell(ft.Text(entry.get("status", ""))),
+                ft.DataCell(entrega_text),
                 ft.DataCell(ft.Text(entry.get("time", ""))),
             ]))
 
@@ -69,6 +84,7 @@ def build_reports(state: dict, page):
                 ft.DataColumn(ft.Text("Telefone")),
                 ft.DataColumn(ft.Text("CNPJ")),
                 ft.DataColumn(ft.Text("Status")),
+                ft.DataColumn(ft.Text("Entrega")),
                 ft.DataColumn(ft.Text("Horário")),
             ],
             rows=detail_rows,
@@ -83,10 +99,12 @@ def build_reports(state: dict, page):
             message_label.value = "Relatório gerado"
             page.update()
 
-            # prepara CSV em memória
+            # prepara CSV em memória (csv/io só são carregados ao exportar)
+            import csv
+            import io
             output = io.StringIO()
             writer = csv.writer(output)
-            writer.writerow(["nome", "email", "telefone", "cnpj", "status", "time"])
+            writer.writerow(["nome", "email", "telefone", "cnpj", "status", "entrega", "time"])
             for ent in r.get("entries", []):
                 writer.writerow([
                     ent.get("to", ""),
@@ -94,6 +112,7 @@ def build_reports(state: dict, page):
                     ent.get("phone", ""),
                     ent.get("cnpj", ""),
                     ent.get("status", ""),
+                    ent.get("delivery", "") or "",
                     ent.get("time", "")
                 ])
             csv_data = output.getvalue().encode("utf-8")
@@ -133,12 +152,52 @@ def build_reports(state: dict, page):
                 pass
 
         export_btn = ft.ElevatedButton("Exportar CSV", on_click=on_export, width=160)
+        actions = [export_btn]
+        diff_view = ft.Column([], spacing=4)
+
+        # reenvio e comparação usam os índices do ReportStore (sem varrer as entradas)
+        if not r.get("dry_run"):
+            pendentes = len(state.pending_failures(r.get("id")))
+
+            rerun_btn = ft.ElevatedButton(f"Reenviar falhas ({pendentes})", width=200, disabled=not pendentes)
+
+            def on_rerun_click(_e):
+                message_label.value, enfileirado = on_rerun(r)
+                # enfileirado com sucesso: evita um segundo clique reenviando as mesmas falhas
+                if enfileirado:
+                    rerun_btn.disabled = True
+                page.update()
+
+            rerun_btn.on_click = on_rerun_click
+            if on_rerun is not None:
+                actions.append(rerun_btn)
+
+            anterior = state.previous_report(r)
+
+            def on_diff_click(_e):
+                diff = diff_reports(anterior, r)
+                diff_view.controls = [
+                    ft.Text(f"Comparação com relatório ID {anterior.get('id')} "
+                            f"({_format_datetime(anterior.get('ts', 0))})", weight="bold"),
+                    ft.Text(f"Corrigidos (falha → sucesso): {len(diff['corrigidos'])}  |  "
+                            f"Ainda com falha: {len(diff['persistentes'])}  |  "
+                            f"Novas falhas: {len(diff['novas_falhas'])}"),
+                    ft.Text(f"Só no anterior: {len(diff['so_no_anterior'])}  |  Só neste: {len(diff['so_no_novo'])}"),
+                ]
+                if diff["persistentes"]:
+                    telefones = ", ".join(diff["persistentes"][:20])
+                    diff_view.controls.append(ft.Text(f"Telefones ainda com falha: {telefones}", size=12, selectable=True))
+                page.update()
+
+            if anterior is not None:
+                actions.append(ft.ElevatedButton("Comparar com anterior", on_click=on_diff_click, width=200))
 
         selected_report_detail.controls = [
             # message_label sempre visível quando os detalhes são exibidos
             message_label,
             header,
-            ft.Row([export_btn], spacing=10),
+            ft.Row(actions, spacing=10),
+            diff_view,
             table_scroll
         ]
         page.update()
@@ -150,12 +209,17 @@ def build_reports(state: dict, page):
         r = reports[original_idx]
         # capture both original_idx and display_id in defaults to avoid late binding
         view_btn = ft.ElevatedButton("Ver", on_click=lambda e, oi=original_idx, di=display_id: _show_report_detail(oi, di), width=60)
+        entregues_text = ft.Text(str(r.get("delivery", {}).get("entregue", 0)))
+        lidas_text = ft.Text(str(r.get("delivery", {}).get("lida", 0)))
+        delivery_cells.append((r, entregues_text, lidas_text))
         rows.append(ft.DataRow(cells=[
             ft.DataCell(ft.Text(str(display_id))),
-            ft.DataCell(ft.Text(_format_datetime(r.get("ts", 0)))),
+            ft.DataCell(ft.Text(_format_datetime(r.get("ts", 0)) + (" (simulação)" if r.get("dry_run") else ""))),
             ft.DataCell(ft.Text(str(r.get("total", 0)))),
             ft.DataCell(ft.Text(str(r.get("successes", 0)))),
             ft.DataCell(ft.Text(str(r.get("failures", 0)))),
+            ft.DataCell(entregues_text),
+            ft.DataCell(lidas_text),
             ft.DataCell(view_btn),
         ]))
 
@@ -166,6 +230,8 @@ def build_reports(state: dict, page):
             ft.DataColumn(ft.Text("Total")),
             ft.DataColumn(ft.Text("Sucessos")),
             ft.DataColumn(ft.Text("Falhas")),
+            ft.DataColumn(ft.Text("Entregues")),
+            ft.DataColumn(ft.Text("Lidas")),
             ft.DataColumn(ft.Text("Ações")),
         ],
         rows=rows,
@@ -175,9 +241,20 @@ def build_reports(state: dict, page):
 
     reports_table_container = ft.Column([reports_table], scroll=ft.ScrollMode.AUTO, width=800, height=260)
 
+    summary = _reports_summary(reports)
+
+    def refresh_delivery():
+        """Atualiza os controles de entrega existentes; o chamador faz page.update()."""
+        summary.controls = _reports_summary(reports).controls
+        for r, entregues_text, lidas_text in delivery_cells:
+            entregues_text.value = str(r.get("delivery", {}).get("entregue", 0))
+            lidas_text.value = str(r.get("delivery", {}).get("lida", 0))
+        for entry, entrega_text in detail_delivery:
+            entrega_text.value = entry.get("delivery", "") or "-"
+
     body = ft.Column(
         [
-            _reports_summary(reports),
+            summary,
             ft.Divider(),
             ft.Text("Histórico de relatórios", weight="bold"),
             reports_table_container,
@@ -196,4 +273,4 @@ def build_reports(state: dict, page):
             ft.Text("Nenhum relatório disponível. As execuções de disparo irão gerar relatórios aqui."),
         ]
 
-    return ft.Container(content=body, padding=20, expand=True)
+    return ft.Container(content=body, padding=20, expand=True, data=refresh_delivery)